@@ -0,0 +1,159 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from demand import approach_edges, counts_to_flows, read_counts
+from egt_so4 import sumo_config, approaches, strategies, weights, max_metrics, min_phases, max_phases, replicator_gain
+from population import replicator_update
+from run_store import RunStore
+from sumo_backend import backends
+from sumo_eval import evaluation_sumocfg, remove_worker_dirs, run_simulation
+
+controllers = ["fixed", "egt"]
+
+
+class CycleReplicator:
+    """Picklable cycle-by-cycle EGT controller for run_simulation(on_cycle=...)
+
+    Same replicator update as egt_so4.adapt_cycle() (population.replicator_update()),
+    with its own split and payoff normalisers so every scenario starts from
+    the same state.
+    """
+
+    def __init__(self, initial, gain=replicator_gain):
+        self.plan = dict(initial)
+        self.max_metrics = dict(max_metrics)
+        self.gain = gain
+        self.cycles = 0
+
+    def __call__(self, cycle_stats):
+        self.cycles += 1
+        self.plan, _, _ = replicator_update(cycle_stats, self.plan, self.max_metrics, weights,
+                                            self.gain, min_phases, max_phases)
+        return dict(self.plan)
+
+
+def scenarios(counts_csv=None, per_period=False, period=900, out_dir="demand"):
+    """Scenario dicts (id, route_files, begin, end) of the count dataset
+
+    One scenario per day, or per counting period with per_period. Without
+    counts the .sumocfg demand is used as a single day.
+    """
+    if counts_csv is None:
+        days = {"0": (None, 0, sumo_config["simulation_steps"])}
+    else:
+        files = counts_to_flows(counts_csv, out_dir, *approach_edges(approaches))
+        spans = {}
+        for row in read_counts(counts_csv):
+            begin, end = spans.get(row["day"], (row["begin"], row["end"]))
+            spans[row["day"]] = (min(begin, row["begin"]), max(end, row["end"]))
+        days = {day: (files[day], *spans[day]) for day in files}
+
+    result = []
+    for day, (route_file, begin, end) in sorted(days.items()):
+        windows = [(begin, end)]
+        if per_period:
+            windows = [(b, min(b + period, end)) for b in range(int(begin), int(end), period)]
+        for b, e in windows:
+            result.append({
+                "id": f"day{day}" + (f"_{int(b)}" if per_period else ""),
+                "route_files": [route_file] if route_file else None,
+                "begin": int(b),
+                "end": int(e)
+            })
+    return result
+
+
+def run_scenario(scenario, controller, config):
+    """Worker: one controller on one scenario; returns stats or None on failure"""
+    config = dict(config, route_files=scenario["route_files"], begin=scenario["begin"],
+                  simulation_steps=scenario["end"])
+    label = f"batch_{controller}_{scenario['id']}_{os.getpid()}"
+    try:
+        if controller == "fixed":
+            return run_simulation(dict(strategies), config, approaches, label=label)
+        egt = CycleReplicator(strategies)
+        stats = run_simulation(dict(strategies), config, approaches, label=label, on_cycle=egt)
+        stats["_run"]["final_plan"] = egt.plan
+        stats["_run"]["cycles"] = egt.cycles
+        return stats
+    except Exception as e:
+        print(f"Error in {label}: {str(e)}")
+        return None
+    finally:
+        remove_worker_dirs([label])
+
+
+def batch_runs(store, name, scenario_list, controller_list, resume):
+    """Run ids per controller, reusing the runs of an earlier batch called name when resuming"""
+    existing = {}
+    if resume:
+        for run_id, _, _, config in store.runs("batch"):
+            if config.get("batch") == name:
+                existing[config["controller"]] = run_id
+    runs = {}
+    for controller in controller_list:
+        runs[controller] = existing.get(controller) or store.start_run("batch", {
+            "batch": name,
+            "controller": controller,
+            "scenarios": [s["id"] for s in scenario_list],
+            "sumo_config": sumo_config
+        })
+    return runs
+
+
+def run_batch(scenario_list, controller_list, name, store, workers=None, resume=False):
+    """Run every controller on every scenario, streaming results into the store
+
+    Scenario i of a controller is generation i of that controller's run, so
+    a resumed batch skips every pair that already has rows in the store.
+    """
+    runs = batch_runs(store, name, scenario_list, controller_list, resume)
+    done = {(row["run_id"], row["generation"]) for row in store.generations(runs.values())}
+    jobs = [(i, scenario, controller) for i, scenario in enumerate(scenario_list)
+            for controller in controller_list if (runs[controller], i) not in done]
+    print(f"{len(jobs)} runs to do, {len(scenario_list) * len(controller_list) - len(jobs)} already done")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_scenario, scenario, controller, sumo_config): (i, scenario, controller)
+                   for i, scenario, controller in jobs}
+        for future in as_completed(futures):
+            i, scenario, controller = futures[future]
+            stats = future.result()
+            if stats is None:
+                continue
+            for approach in approaches:
+                store.log(runs[controller], i, approach, dict(
+                    stats[approach],
+                    green_time=stats["_run"].get("final_plan", strategies)[approach],
+                    scenario=scenario["id"]
+                ))
+            # Commit per scenario: this is the checkpoint a resumed batch starts from
+            store.flush()
+            delay = sum(stats[a]["mean_delay"] for a in approaches)
+            print(f"{scenario['id']:<14} | {controller:<6} | {delay:>8.2f} s summed mean delay")
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fixed-time and EGT control over every scenario of the count dataset")
+    parser.add_argument("--counts", help="15-minute counts CSV (see demand.py); default: the .sumocfg demand")
+    parser.add_argument("--per-period", action="store_true", help="one scenario per counting period instead of per day")
+    parser.add_argument("--controllers", nargs="+", choices=controllers, default=controllers)
+    parser.add_argument("--name", default="batch", help="batch name, used to find it again with --resume")
+    parser.add_argument("--resume", action="store_true", help="skip scenarios already in the store")
+    parser.add_argument("--store", default="runs.sqlite")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sumo-bin", default=sumo_config["sumo_bin"])
+    parser.add_argument("--backend", choices=backends, default=sumo_config["backend"])
+    args = parser.parse_args()
+    sumo_config["sumo_bin"] = args.sumo_bin
+    sumo_config["backend"] = args.backend
+    if sumo_config["sumocfg_profile"] == "lean":
+        sumo_config["lean_sumocfg"] = evaluation_sumocfg(sumo_config["sumocfg"])
+
+    store = RunStore(args.store)
+    scenario_list = scenarios(args.counts, args.per_period)
+    runs = run_batch(scenario_list, args.controllers, args.name, store, args.workers, args.resume)
+    store.close()
+    print(f"Results saved to runs {runs} in {args.store}")
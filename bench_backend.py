@@ -0,0 +1,42 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from egt_so4 import sumo_config, approaches, strategies
+from sumo_backend import get_backend
+from sumo_eval import run_simulation
+
+
+def timed_run(backend, sumo_bin, steps):
+    """Wall time and steps of one full run_simulation() on backend"""
+    config = dict(sumo_config, sumo_bin=sumo_bin, backend=backend, simulation_steps=steps)
+    start = time.perf_counter()
+    stats = run_simulation(dict(strategies), config, approaches, label=f"bench_{backend}")
+    return time.perf_counter() - start, stats["_run"]["steps"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steps per second of the libsumo and traci backends")
+    parser.add_argument("--sumo-bin", default=sumo_config["sumo_bin"])
+    parser.add_argument("--steps", type=int, default=sumo_config["simulation_steps"])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rates = {}
+    for backend in ["traci", "libsumo"]:
+        try:
+            get_backend(backend)
+        except ImportError:
+            print(f"{backend:<8} | not installed")
+            continue
+        best = float("inf")
+        for _ in range(args.repeats):
+            # A fresh process per run: libsumo holds one simulation per process
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, steps = pool.submit(timed_run, backend, args.sumo_bin, args.steps).result()
+            best = min(best, elapsed)
+        rates[backend] = steps / best
+        print(f"{backend:<8} | {best:>7.2f} s | {rates[backend]:>8.1f} steps/s")
+
+    if len(rates) == 2:
+        print(f"Speed-up: {rates['libsumo'] / rates['traci']:.2f}x")
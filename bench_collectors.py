@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from collectors import SubscriptionCollector
+from egt_so4 import sumo_config, approaches
+from network_index import load_index, lane_approach
+from sumo_backend import start as start_sumo
+from sumo_eval import get_approach_metrics
+
+
+def run(collector, sumo_bin, steps):
+    """Time `steps` simulation steps with the given collector, returning (steps/s, total delay samples)"""
+    # Round trips are what the collectors differ in, so always measure over the socket
+    conn = start_sumo([
+        sumo_bin,
+        "-c", sumo_config["sumocfg"],
+        "--net-file", sumo_config["net_file"],
+        "--no-step-log", "true"
+    ], "traci", label=f"bench_{collector}")
+
+    lane_map = lane_approach(load_index(sumo_config["net_file"]), approaches)
+    if collector == "subscription":
+        collect = SubscriptionCollector(conn, approaches, lane_map).collect
+    else:
+        collect = lambda: get_approach_metrics(conn, lane_map, approaches)
+
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        conn.simulationStep()
+        metrics = collect()
+        samples += sum(len(m["vehicles"]) for m in metrics.values())
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return steps / elapsed, samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steps per second of the metric collectors")
+    parser.add_argument("--sumo-bin", default=sumo_config["sumo_bin"])
+    parser.add_argument("--steps", type=int, default=sumo_config["simulation_steps"])
+    args = parser.parse_args()
+
+    results = {c: run(c, args.sumo_bin, args.steps) for c in ["polling", "subscription"]}
+    for collector, (rate, samples) in results.items():
+        print(f"{collector:<13} | {rate:>8.1f} steps/s | {samples:>8} delay samples")
+    print(f"Speed-up: {results['subscription'][0] / results['polling'][0]:.2f}x")
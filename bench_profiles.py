@@ -0,0 +1,41 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from egt_so4 import sumo_config, approaches, strategies
+from sumo_eval import run_simulation
+
+
+def timed_run(profile, sumo_bin, steps, backend):
+    """Startup time, total wall time and summed mean delay of one run_simulation() with profile"""
+    config = dict(sumo_config, sumo_bin=sumo_bin, backend=backend, simulation_steps=steps,
+                  sumocfg_profile=profile)
+    start = time.perf_counter()
+    stats = run_simulation(dict(strategies), config, approaches, label=f"bench_{profile}")
+    elapsed = time.perf_counter() - start
+    startup = sum(stats["_profile"][name][0] for name in ("start", "setup"))
+    return startup, elapsed, sum(stats[a]["mean_delay"] for a in approaches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup and run time of the full and lean SUMO configs")
+    parser.add_argument("--sumo-bin", default=sumo_config["sumo_bin"])
+    parser.add_argument("--backend", default=sumo_config["backend"])
+    parser.add_argument("--steps", type=int, default=sumo_config["simulation_steps"])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    best = {}
+    for profile in ["full", "lean"]:
+        runs = []
+        for _ in range(args.repeats):
+            # A fresh process per run: libsumo holds one simulation per process
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                runs.append(pool.submit(timed_run, profile, args.sumo_bin, args.steps, args.backend).result())
+        startup = min(r[0] for r in runs)
+        total = min(r[1] for r in runs)
+        best[profile] = total
+        print(f"{profile:<5} | startup {startup:>6.2f} s | total {total:>7.2f} s | "
+              f"summed mean delay {runs[0][2]:.3f} s")
+
+    print(f"Speed-up: {best['full'] / best['lean']:.2f}x")
@@ -0,0 +1,277 @@
+import os
+import sys
+import csv
+import json
+import subprocess
+import argparse
+import hashlib
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import quoteattr
+
+from result_cache import file_digest
+
+net_file = "osm.net.xml.gz"
+manifest_file = "demand_manifest.json"
+
+# randomTrips.py options shared by every class (see build.bat)
+common_options = [
+    "-b", "0", "-e", "3600",
+    "--trip-attributes", 'departLane="best"',
+    "--fringe-start-attributes", 'departSpeed="max"',
+    "--validate", "--remove-loops",
+    "--via-edge-types", "highway.motorway,highway.motorway_link,highway.trunk_link,"
+                        "highway.primary_link,highway.secondary_link,highway.tertiary_link"
+]
+
+vehicle_classes = {
+    "bicycle": ["--fringe-factor", "2", "--insertion-density", "6", "--vehicle-class", "bicycle",
+                "--vclass", "bicycle", "--prefix", "bike", "--max-distance", "8000"],
+    "bus": ["--fringe-factor", "5", "--insertion-density", "4", "--vehicle-class", "bus",
+            "--vclass", "bus", "--prefix", "bus", "--min-distance", "600", "--min-distance.fringe", "10"],
+    "motorcycle": ["--fringe-factor", "2", "--insertion-density", "4", "--vehicle-class", "motorcycle",
+                   "--vclass", "motorcycle", "--prefix", "motorcycle", "--max-distance", "1200"],
+    "passenger": ["--fringe-factor", "5", "--insertion-density", "12", "--vehicle-class", "passenger",
+                  "--vclass", "passenger", "--prefix", "veh", "--min-distance", "300",
+                  "--min-distance.fringe", "10", "--allow-fringe.min-length", "1000", "--lanes"],
+    "truck": ["--fringe-factor", "5", "--insertion-density", "8", "--vehicle-class", "truck",
+              "--vclass", "truck", "--prefix", "truck", "--min-distance", "600", "--min-distance.fringe", "10"]
+}
+
+# duarouter options for pre-routing the trip files; errors are skipped like ignore-route-errors in the .sumocfg
+duarouter_options = ["--ignore-errors", "--no-step-log", "--no-warnings"]
+
+# Classes of the 15-minute counts and the SUMO vehicle types they become
+count_types = {
+    "car": {"vClass": "passenger"},
+    "motorcycle": {"vClass": "motorcycle"},
+    "auto": {"vClass": "passenger", "length": "3.2", "maxSpeed": "13.9", "guiShape": "passenger/hatchback"},
+    "bus": {"vClass": "bus"},
+    "truck": {"vClass": "truck"}
+}
+
+
+def _tools():
+    """randomTrips.py and friends live in $SUMO_HOME/tools (or the eclipse-sumo package)"""
+    home = os.environ.get("SUMO_HOME")
+    if home is None:
+        home = importlib.import_module("sumo").SUMO_HOME
+    tools = os.path.join(home, "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+
+
+def _share_networks():
+    """Make sumolib.net.readNet return one parsed network per file for this process"""
+    import sumolib.net
+    if getattr(sumolib.net.readNet, "shared", False):
+        return
+    read = sumolib.net.readNet
+    nets = {}
+
+    def read_net(path, **kwargs):
+        key = (os.path.abspath(path), tuple(sorted(kwargs.items())))
+        if key not in nets:
+            nets[key] = read(path, **kwargs)
+        return nets[key]
+    read_net.shared = True
+    sumolib.net.readNet = read_net
+
+
+class Manifest:
+    """Input digests of every generated file, so unchanged demand is not rebuilt"""
+
+    def __init__(self, path=manifest_file):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def digest(inputs, options):
+        parts = {"inputs": {p: file_digest(p) for p in inputs}, "options": options}
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def current(self, outputs, digest):
+        """True when every output exists and was built from inputs with this digest"""
+        return all(
+            os.path.exists(p) and self.entries.get(p, {}).get("inputs") == digest
+            and self.entries[p].get("output") == file_digest(p)
+            for p in outputs
+        )
+
+    def record(self, outputs, digest):
+        for p in outputs:
+            self.entries[p] = {"inputs": digest, "output": file_digest(p)}
+
+    def save(self):
+        # Concurrent builds each write their own temporary file and replace the manifest atomically
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def class_files(vclass):
+    return f"osm.{vclass}.trips.xml", f"osm.{vclass}.rou.xml"
+
+
+def _random_trips(vclass, net, seed):
+    """Worker: randomTrips.py for one vehicle class, in-process"""
+    _tools()
+    _share_networks()
+    import randomTrips
+    trips, routes = class_files(vclass)
+    options = randomTrips.get_options(["-n", net, "-o", trips, "-r", routes, "--seed", str(seed)]
+                                      + common_options + vehicle_classes[vclass])
+    if not randomTrips.main(options):
+        raise RuntimeError(f"randomTrips could not generate {vclass} trips")
+    return vclass
+
+
+def build_random_trips(classes=None, net=net_file, seed=42, workers=None, force=False,
+                       manifest=None):
+    """Trip and route files of every vehicle class, generated in parallel; returns the classes built
+
+    Classes whose outputs already match the network and options are skipped.
+    """
+    manifest = manifest or Manifest()
+    classes = list(classes or vehicle_classes)
+    digests = {c: Manifest.digest([net], [seed] + common_options + vehicle_classes[c]) for c in classes}
+    todo = [c for c in classes if force or not manifest.current(class_files(c), digests[c])]
+    if todo:
+        _tools()
+        _share_networks()
+        # Parsed once here; forked workers inherit it, spawned ones parse it once each
+        importlib.import_module("sumolib").net.readNet(net)
+        with ProcessPoolExecutor(max_workers=workers or len(todo)) as pool:
+            for vclass in pool.map(_random_trips, todo, [net] * len(todo), [seed] * len(todo)):
+                manifest.record(class_files(vclass), digests[vclass])
+        manifest.save()
+    return todo
+
+
+def routed_demand(trip_files, net=net_file, out_dir="demand", gz=True, force=False, manifest=None):
+    """Route trip_files once with duarouter into one departure-sorted route file; returns its path
+
+    The file is named after the digest of the network, the inputs and the
+    options, so a run with unchanged demand reuses it instead of having
+    SUMO route every trip at insertion again.
+    """
+    manifest = manifest or Manifest()
+    digest = Manifest.digest([net] + list(trip_files), duarouter_options)
+    path = os.path.join(out_dir, f"routed_{digest[:16]}.rou.xml" + (".gz" if gz else ""))
+    if not force and manifest.current([path], digest):
+        return path
+
+    _tools()
+    duarouter = importlib.import_module("sumolib").checkBinary("duarouter")
+    os.makedirs(out_dir, exist_ok=True)
+    # duarouter reads all inputs by departure time, so the merged output is sorted;
+    # concurrent runs routing the same demand each write their own temporary file
+    tmp = path.replace(".rou.xml", f".{os.getpid()}.tmp.rou.xml")
+    subprocess.run([duarouter, "-n", net, "--route-files", ",".join(trip_files), "-o", tmp]
+                   + duarouter_options, check=True, stdout=subprocess.DEVNULL)
+    os.replace(tmp, path)
+    # duarouter also writes route alternatives next to its output; nothing reads them
+    alternatives = tmp.replace(".rou.xml", ".rou.alt.xml")
+    if os.path.exists(alternatives):
+        os.remove(alternatives)
+    manifest.record([path], digest)
+    manifest.save()
+    return path
+
+
+def read_counts(path):
+    """Rows of a counts CSV: day, begin, end (seconds), from, to, class, count"""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield {
+                "day": row["day"],
+                "begin": float(row["begin"]),
+                "end": float(row["end"]),
+                "from": row["from"],
+                "to": row["to"],
+                "class": row["class"],
+                "count": int(float(row["count"]))
+            }
+
+
+def approach_edges(approaches):
+    """Origin and destination edge of every approach name: its inbound edge and its exit from J0"""
+    origins = {name: data["edges"][0] for name, data in approaches.items()}
+    destinations = {name: data["exit"] for name, data in approaches.items()}
+    return origins, destinations
+
+
+def counts_to_flows(counts_csv, out_dir="demand", edges=None, exits=None, force=False, manifest=None):
+    """One <flow> route file per day from 15-minute classified movement counts
+
+    from and to are edge ids, or names looked up in edges and exits
+    respectively (see approach_edges()). Days whose file is already built from the same counts are kept.
+    Returns {day: route file}.
+    """
+    manifest = manifest or Manifest()
+    edges = edges or {}
+    exits = exits or {}
+    days = {}
+    for row in read_counts(counts_csv):
+        days.setdefault(row["day"], []).append(row)
+
+    os.makedirs(out_dir, exist_ok=True)
+    digest = Manifest.digest([counts_csv], [count_types, edges, exits])
+    files = {}
+    for day, rows in days.items():
+        path = os.path.join(out_dir, f"day{day}.flows.rou.xml")
+        files[day] = path
+        if not force and manifest.current([path], digest):
+            continue
+        rows.sort(key=lambda r: (r["begin"], r["from"], r["to"], r["class"]))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<routes>\n')
+            for name, attributes in count_types.items():
+                attrs = "".join(f" {k}={quoteattr(v)}" for k, v in attributes.items())
+                f.write(f'    <vType id="{name}"{attrs}/>\n')
+            for i, row in enumerate(rows):
+                if row["count"] <= 0:
+                    continue
+                f.write(
+                    f'    <flow id="{row["class"]}_{row["from"]}_{row["to"]}_{i}" type={quoteattr(row["class"])} '
+                    f'begin="{row["begin"]:g}" end="{row["end"]:g}" number="{row["count"]}" '
+                    f'from={quoteattr(edges.get(row["from"], row["from"]))} '
+                    f'to={quoteattr(exits.get(row["to"], row["to"]))} '
+                    f'departLane="best" departSpeed="max"/>\n'
+                )
+            f.write("</routes>\n")
+        manifest.record([path], digest)
+    manifest.save()
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the SUMO demand: random trips or flows from counts")
+    parser.add_argument("--counts", help="15-minute counts CSV (day,begin,end,from,to,class,count)")
+    parser.add_argument("--out", default="demand", help="output directory of the per-day flow files")
+    parser.add_argument("--classes", nargs="+", choices=list(vehicle_classes),
+                        help="vehicle classes for random trips (default: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs are unchanged")
+    parser.add_argument("--route", action="store_true",
+                        help="also pre-route the .sumocfg demand into one merged route file")
+    args = parser.parse_args()
+
+    if args.counts:
+        # Approach names in the counts resolve to their inbound edge (from) and J0 exit (to)
+        from egt_so4 import approaches
+        edges, exits = approach_edges(approaches)
+        for day, path in counts_to_flows(args.counts, args.out, edges, exits, args.force).items():
+            print(f"day {day}: {path}")
+    else:
+        built = build_random_trips(args.classes, seed=args.seed, workers=args.workers, force=args.force)
+        print(f"Built: {', '.join(built) or 'nothing, demand is up to date'}")
+    if args.route:
+        from egt_so4 import sumo_config
+        from result_cache import route_files
+        print(f"Routed: {routed_demand(route_files(sumo_config['sumocfg']), sumo_config['net_file'], force=args.force)}")
@@ -0,0 +1,171 @@
+import os
+from xml.sax.saxutils import quoteattr
+
+import traci.constants as tc
+
+from network_index import load_index, lane_approach
+from online_stats import QuantileSketch
+
+# Read from every detector each time the simulation is advanced
+detector_variables = [tc.VAR_INTERVAL_NUMBER, tc.VAR_INTERVAL_TIMELOSS, tc.VAR_INTERVAL_OCCUPANCY,
+                      tc.JAM_LENGTH_VEHICLE, tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+
+
+def detector_id(lane):
+    return f"e2_{lane}"
+
+
+def write_detectors(net_file, approaches, path, period):
+    """Additional file with a lane-area (E2) detector over the whole of every approach lane
+
+    Detectors aggregate over period seconds; with period at least the run
+    length their interval values are running totals of the whole run. The
+    file is only rewritten when its content changes.
+    """
+    index = load_index(net_file)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<additional>"]
+    for lane in lane_approach(index, approaches):
+        lines.append(
+            f'    <laneAreaDetector id={quoteattr(detector_id(lane))} lane={quoteattr(lane)} pos="0" '
+            f'length="{index["lanes"][lane]["length"]:.2f}" friendlyPos="true" '
+            f'period="{period}" file="NUL"/>'
+        )
+    lines.append("</additional>")
+    text = "\n".join(lines) + "\n"
+
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            if f.read() == text:
+                return path
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
+
+
+class DetectorReader:
+    """Approach metrics from the E2 detectors of write_detectors(), one batched read per advance
+
+    Every detector is subscribed once; read() only decodes the results that
+    came back with the last simulationStep(), so it costs no round trip.
+    Vehicle counts and time loss are running totals over the detector
+    interval, so the values of a cycle are differences of two reads.
+    """
+
+    def __init__(self, conn, approaches, lane_map):
+        self.conn = conn
+        self.approaches = list(approaches)
+        self.detectors = {detector_id(lane): approach for lane, approach in lane_map.items()}
+        for detector in self.detectors:
+            conn.lanearea.subscribe(detector, detector_variables)
+
+    def read(self):
+        """Per approach: vehicles and total time loss so far, mean occupancy, current jam and halting"""
+        metrics = {approach: {
+            "vehicles": 0,
+            "time_loss": 0.0,
+            "occupancy": 0.0,
+            "lanes": 0,
+            "max_queue": 0,
+            "halting": 0
+        } for approach in self.approaches}
+
+        for detector, values in self.conn.lanearea.getAllSubscriptionResults().items():
+            approach = self.detectors.get(detector)
+            if approach is None:
+                continue
+            data = metrics[approach]
+            vehicles = values[tc.VAR_INTERVAL_NUMBER]
+            data["vehicles"] += vehicles
+            data["time_loss"] += values[tc.VAR_INTERVAL_TIMELOSS] * vehicles
+            data["occupancy"] += values[tc.VAR_INTERVAL_OCCUPANCY]
+            data["lanes"] += 1
+            data["max_queue"] = max(data["max_queue"], values[tc.JAM_LENGTH_VEHICLE])
+            data["halting"] += values[tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+
+        for data in metrics.values():
+            data["occupancy"] /= max(data.pop("lanes"), 1)
+        return metrics
+
+
+class CycleTotals:
+    """Run stats of a cycle-stepped run, folded from the detector reads
+
+    Spans only close at cycle boundaries (add()), so max_delay is the mean
+    delay of the worst whole cycle; reads in between (race checkpoints) go
+    to cost() and leave the spans alone. A queue is sampled when its
+    approach turns from red to green (sample_queue()), where it peaks, so
+    max_queue matches the per-step maximum, while mean_queue is the mean of
+    those peaks rather than a mean over every step.
+    """
+
+    def __init__(self, approaches):
+        self.approaches = list(approaches)
+        self.last = {approach: {"vehicles": 0, "time_loss": 0.0} for approach in self.approaches}
+        self.cycle_delay = {approach: QuantileSketch() for approach in self.approaches}
+        self.queue = {approach: QuantileSketch(bin_width=1, limit=1000) for approach in self.approaches}
+        self.cycle_queue = dict.fromkeys(self.approaches, 0)
+
+    def sample_queue(self, approach, current):
+        """Record the queue of approach from a read taken as its green begins"""
+        queue = current[approach]["max_queue"]
+        self.queue[approach].add(queue)
+        self.cycle_queue[approach] = queue
+
+    def add(self, current):
+        """Fold in the read at a cycle boundary; returns the stats of the cycle just ended"""
+        span = {}
+        for approach in self.approaches:
+            data, last = current[approach], self.last[approach]
+            vehicles = data["vehicles"] - last["vehicles"]
+            time_loss = data["time_loss"] - last["time_loss"]
+            mean_delay = time_loss / vehicles if vehicles > 0 else 0.0
+            if vehicles > 0:
+                self.cycle_delay[approach].add(mean_delay)
+            self.last[approach] = {"vehicles": data["vehicles"], "time_loss": data["time_loss"]}
+            queue = self.cycle_queue[approach]
+            span[approach] = {
+                "mean_delay": mean_delay,
+                "max_delay": mean_delay,
+                "throughput": vehicles,
+                "mean_queue": queue,
+                "max_queue": queue,
+                "occupancy": data["occupancy"]
+            }
+        self.cycle_queue = dict.fromkeys(self.approaches, 0)
+        return span
+
+    def stats(self, current=None):
+        """Run stats; current is the final read, covering the time since the last boundary"""
+        stats = {}
+        for approach in self.approaches:
+            last = current[approach] if current is not None else self.last[approach]
+            delay, queue = self.cycle_delay[approach], self.queue[approach]
+            stats[approach] = {
+                "mean_delay": last["time_loss"] / last["vehicles"] if last["vehicles"] > 0 else 0,
+                "max_delay": max(delay.moments.max, 0),
+                "p95_delay": delay.percentile(95),
+                "throughput": 0,
+                "mean_queue": queue.moments.mean,
+                "max_queue": int(queue.moments.max) if queue.count else 0,
+                "p95_queue": queue.percentile(95)
+            }
+        return stats
+
+    def summary(self, current=None):
+        """Per-approach [count, mean, std] as race checkpoints keep them
+
+        Detectors give no per-vehicle delays, so the spread is that of the
+        whole cycles' mean delays and sampled queues.
+        """
+        stats = self.stats(current)
+        summary = {}
+        for approach in self.approaches:
+            delay, queue = self.cycle_delay[approach].moments, self.queue[approach].moments
+            summary[approach] = {"delay": [delay.count, stats[approach]["mean_delay"], delay.std],
+                                 "queue": [queue.count, queue.mean, queue.std]}
+        return summary
+
+    def cost(self, current=None):
+        return float(sum(s["mean_delay"] for s in self.stats(current).values()))
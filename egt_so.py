@@ -1,8 +1,8 @@
 import traci
-import os
 import random
-import gzip
-from xml.etree import ElementTree as ET
+
+from tls_control import start_cycle
+from tripinfo_stream import aggregate_tripinfo
 
 # SUMO Configuration
 sumo_config = {
@@ -31,31 +31,16 @@ approaches = {
     "east": ["143870423"]
 }
 
-def update_traffic_light_phases():
-    """Update green durations in osm.net.xml.gz"""
-    with gzip.open("osm.net.xml.gz", "rt", encoding="utf-8") as f:
-        tree = ET.parse(f)
-        root = tree.getroot()
-
-    for tl_logic in root.findall(".//tlLogic"):
-        if tl_logic.get("id") == "J0":
-            phases = tl_logic.findall("phase")
-            phases[0].set("duration", str(strategies["west"]))
-            phases[2].set("duration", str(strategies["south"]))
-            phases[4].set("duration", str(strategies["north"]))
-            phases[6].set("duration", str(strategies["east"]))
-
-    with gzip.open("osm_updated.net.xml.gz", "wb") as f:
-        tree.write(f, encoding="utf-8", xml_declaration=True)
-
 def run_simulation():
     """Run SUMO simulation and return mean delays"""
     traci.start([
         sumo_config["sumo_bin"],
         "-c", sumo_config["sumocfg"],
-        "--net-file", "osm_updated.net.xml.gz",
+        "--net-file", sumo_config["net_file"],
         "--tripinfo-output", "tripinfo.xml"
     ])
+    # The split goes to J0's running programme; the network file is left as is
+    start_cycle(traci, strategies)
     
     # Run simulation for the full duration
     for _ in range(sumo_config["simulation_steps"]):
@@ -63,44 +48,23 @@ def run_simulation():
     
     traci.close()
     
-    # Parse tripinfo.xml
-    tree = ET.parse("tripinfo.xml")
-    root = tree.getroot()
-    approach_data = {key: [] for key in approaches.keys()}
-
-    for trip in root.findall('tripinfo'):
-        time_loss = float(trip.get('timeLoss', 0))
-        depart_lane = trip.get('departLane', '')
-        start_edge = depart_lane.split('_')[0]
-
-        for approach, edges in approaches.items():
-            if start_edge in edges:
-                approach_data[approach].append(time_loss)
-                break
-
-    # Calculate mean delays
-    mean_delays = {}
-    for approach, delays in approach_data.items():
-        mean_delays[approach] = sum(delays) / len(delays) if delays else 0
-    
-    return mean_delays
+    # Stream tripinfo.xml into per-approach time loss statistics
+    trips = aggregate_tripinfo("tripinfo.xml", approaches)
+    return {approach: data["mean"] for approach, data in trips.items()}
 
 # Evolutionary loop
 for generation in range(num_generations):
     print(f"\n=== Generation {generation + 1} ===")
     
-    # 1. Update green durations in .net.xml
-    update_traffic_light_phases()
-    
-    # 2. Run simulation and get delays
+    # 1. Run simulation and get delays
     mean_delays = run_simulation()
     print("Current Mean Delays:", mean_delays)
     
-    # 3. Calculate payoffs (inverse of delay)
+    # 2. Calculate payoffs (inverse of delay)
     payoffs = {approach: 1 / (mean_delays[approach] + 1e-6) for approach in strategies}
     total_payoff = sum(payoffs.values())
     
-    # 4. Update strategies (replicator dynamics)
+    # 3. Update strategies (replicator dynamics)
     for approach in strategies:
         if total_payoff > 0:
             # Increase green time proportionally to payoff
@@ -1,11 +1,12 @@
 import traci
 import os
 import random
-import gzip
 import numpy as np
-from xml.etree import ElementTree as ET
-import csv
-from datetime import datetime
+
+from profiling import Profiler
+from run_store import RunStore
+from tls_control import start_cycle
+from tripinfo_stream import aggregate_tripinfo
 
 # SUMO Configuration
 sumo_config = {
@@ -34,90 +35,47 @@ approaches = {
 }
 
 # Initialize logging
-log_file = f"optimization_log_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-with open(log_file, 'w', newline='') as f:
-    writer = csv.writer(f)
-    writer.writerow(["Generation", "Approach", "GreenTime", "MeanDelay", "MaxDelay", "MinDelay", "VehicleCount"])
+store = RunStore("runs.sqlite")
+run_id = store.start_run("egt_so3", {"strategies": strategies})
 
 def log_results(generation, approach_data):
-    """Log results to CSV file"""
-    with open(log_file, 'a', newline='') as f:
-        writer = csv.writer(f)
-        for approach, data in approach_data.items():
-            writer.writerow([
-                generation,
-                approach,
-                strategies[approach],
-                data["mean"],
-                data["max"],
-                data["min"],
-                data["count"]
-            ])
-
-def update_traffic_light_phases():
-    """Update green durations in osm.net.xml.gz"""
-    with gzip.open("osm.net.xml.gz", "rt", encoding="utf-8") as f:
-        tree = ET.parse(f)
-        root = tree.getroot()
-
-    for tl_logic in root.findall(".//tlLogic"):
-        if tl_logic.get("id") == "J0":
-            phases = tl_logic.findall("phase")
-            phases[0].set("duration", str(strategies["west"]))
-            phases[2].set("duration", str(strategies["south"]))
-            phases[4].set("duration", str(strategies["north"]))
-            phases[6].set("duration", str(strategies["east"]))
-
-    with gzip.open("osm_updated.net.xml.gz", "wb") as f:
-        tree.write(f, encoding="utf-8", xml_declaration=True)
+    """Log results to the run store"""
+    for approach, data in approach_data.items():
+        store.log(run_id, generation, approach, {
+            "green_time": strategies[approach],
+            "mean_delay": data["mean"],
+            "max_delay": data["max"],
+            "min_delay": data["min"],
+            "vehicle_count": data["count"]
+        })
 
 def run_simulation():
     """Run SUMO simulation and return delay statistics"""
-    traci.start([
-        sumo_config["sumo_bin"],
-        "-c", sumo_config["sumocfg"],
-        "--net-file", "osm_updated.net.xml.gz",
-        "--tripinfo-output", "tripinfo.xml"
-    ])
+    with profiler.section("start"):
+        traci.start([
+            sumo_config["sumo_bin"],
+            "-c", sumo_config["sumocfg"],
+            "--net-file", sumo_config["net_file"],
+            "--tripinfo-output", "tripinfo.xml"
+        ])
+    # The split goes to J0's running programme; the network file is left as is
+    with profiler.section("tls"):
+        start_cycle(traci, strategies)
     
+    simulation_step = profiler.timed("step", traci.simulationStep)
     for _ in range(sumo_config["simulation_steps"]):
-        traci.simulationStep()
+        simulation_step()
     
-    traci.close()
+    with profiler.section("close"):
+        traci.close()
     
-    # Parse tripinfo.xml
-    tree = ET.parse("tripinfo.xml")
-    root = tree.getroot()
-    approach_data = {key: {"delays": [], "count": 0} for key in approaches.keys()}
-
-    for trip in root.findall('tripinfo'):
-        time_loss = float(trip.get('timeLoss', 0))
-        depart_lane = trip.get('departLane', '')
-        start_edge = depart_lane.split('_')[0]
-
-        for approach, edges in approaches.items():
-            if start_edge in edges:
-                approach_data[approach]["delays"].append(time_loss)
-                approach_data[approach]["count"] += 1
-                break
-
-    # Calculate statistics
-    stats = {}
-    for approach, data in approach_data.items():
-        if data["count"] > 0:
-            stats[approach] = {
-                "mean": np.mean(data["delays"]),
-                "max": np.max(data["delays"]),
-                "min": np.min(data["delays"]),
-                "count": data["count"]
-            }
-        else:
-            stats[approach] = {
-                "mean": 0,
-                "max": 0,
-                "min": 0,
-                "count": 0
-            }
+    # Stream tripinfo.xml once instead of loading the whole tree
+    with profiler.section("tripinfo"):
+        trip_stats = aggregate_tripinfo("tripinfo.xml", approaches)
+    stats = {
+        approach: {key: data[key] for key in ("mean", "max", "min", "count")}
+        for approach, data in trip_stats.items()
+    }
     
     return stats
 
@@ -125,23 +83,25 @@ def run_simulation():
 for generation in range(num_generations):
     print(f"\n=== Generation {generation + 1}/{num_generations} ===")
     
-    # 1. Update traffic light phases
-    update_traffic_light_phases()
+    profiler = Profiler()
     
-    # 2. Run simulation and get statistics
+    # 1. Run simulation and get statistics
     stats = run_simulation()
     
-    # 3. Log results
-    log_results(generation + 1, stats)
+    # 2. Log results
+    with profiler.section("log"):
+        log_results(generation + 1, stats)
+    store.log_profile(run_id, generation + 1, profiler.report())
+    print(profiler.table())
     
-    # 4. Calculate exponential payoffs (prioritize reducing large delays)
+    # 3. Calculate exponential payoffs (prioritize reducing large delays)
     payoffs = {
         approach: np.exp(-stats[approach]["mean"] / 10)  # Exponential decay payoff
         for approach in strategies
     }
     total_payoff = sum(payoffs.values())
     
-    # 5. Update strategies with momentum
+    # 4. Update strategies with momentum
     print("Current Statistics:")
     for approach in strategies:
         current_stats = stats[approach]
@@ -164,4 +124,5 @@ for generation in range(num_generations):
     
     print("Updated Strategies:", strategies)
 
-print("\nOptimization complete! Results saved to", log_file)
\ No newline at end of file
+store.close()
+print(f"\nOptimization complete! Results saved to run {run_id} in runs.sqlite")
\ No newline at end of file
@@ -1,11 +1,21 @@
-import traci
 import os
-import random
-import gzip
+import pickle
+import argparse
 import numpy as np
-from xml.etree import ElementTree as ET
-import csv
-from datetime import datetime
+
+from demand import routed_demand
+from network_index import load_index
+from online_stats import rank_correlation
+from population import Population, stats_arrays, payoff_matrix, grow_max_metrics, replicator_update
+from profiling import Profiler, cprofile_dump
+from recorder import store_sink
+from replicates import ReplicateScheduler
+from result_cache import ResultCache, config_key, route_files
+from run_store import RunStore
+from snapshots import save_warmup, run_branching
+from sumo_backend import backends
+from surrogate import Surrogate, prescreen
+from sumo_eval import evaluate_candidates, evaluation_sumocfg, run_simulation, run_dir, worker_paths, race_z
 
 # SUMO Configuration
 sumo_config = {
@@ -13,7 +23,15 @@ sumo_config = {
     "net_file": "osm.net.xml.gz",
     "route_file": "osm.rou.xml",
     "sumocfg": "osm.sumocfg",
-    "simulation_steps": 3600
+    "simulation_steps": 3600,
+    "tls_mode": "runtime",  # "runtime": set splits via TraCI, "netfile": rewrite the network
+    "seed": 42,
+    "race_interval": 0,  # steps between early-stop checkpoints, 0 runs every plan in full
+    "race_margin": 0.1,
+    "backend": "auto",  # "libsumo" (in-process), "traci" (socket) or "auto"
+    "sumocfg_profile": "lean",  # "lean": no polygons, outputs or warnings; "full": the .sumocfg as is
+    "demand": "routed",  # "routed": the .sumocfg trips routed once (demand.routed_demand), "trips": as is
+    "stepping": "step"  # "step": per-step metrics, "cycle": advance a J0 cycle at a time, E2 detector metrics
 }
 
 # EGT Parameters
@@ -25,16 +43,18 @@ strategies = {
 }
 mutation_rate = 0.1
 mutation_step = 3
+replicator_gain = 8
 num_generations = 20
 max_phases = 60
 min_phases = 10
 
 # VALIDATED APPROACHES - UPDATE THESE BASED ON YOUR NETWORK
+# edges: inbound approach edges; exit: the edge leaving J0 towards that approach
 approaches = {
-    "west": {"edges": ["15491645#0"]},
-    "south": {"edges": ["142049043#0"]},
-    "north": {"edges": ["141821921#1"]},
-    "east": {"edges": ["143870423"]}
+    "west": {"edges": ["15491645#0"], "exit": "1126771719"},
+    "south": {"edges": ["142049043#0"], "exit": "13848342#0"},
+    "north": {"edges": ["141821921#1"], "exit": "1061772991"},
+    "east": {"edges": ["143870423"], "exit": "1126771722#0"}
 }
 
 # Payoff Weights
@@ -50,210 +70,420 @@ max_metrics = {
     "queue": 20
 }
 
-# Logging setup
-log_file = f"optimization_v3_log_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+# Results go to the run store; run_id is set when the run starts
+store_file = "runs.sqlite"
+store = None
+run_id = None
+
+def init_log(mode, resume=None):
+    global store, run_id
+    store = RunStore(store_file)
+    if resume is not None:
+        run_id = resume["run_id"]
+        # Rows of a generation that did not complete are logged again when it is rerun
+        store.discard_after(run_id, resume["generation"])
+        return
+    run_id = store.start_run("egt_so4", {
+        "mode": mode,
+        "sumo_config": sumo_config,
+        "config_key": config_key(sumo_config, approaches),
+        "strategies": strategies,
+        "weights": weights
+    })
+
+def save_checkpoint(path, state):
+    """Write the optimizer state atomically, so a crash never leaves half a checkpoint"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def log_results(generation, stats, payoffs, adjustments, plan=None, cache_counts=(0, 0),
+                truncated=0, extra=None):
+    plan = plan or strategies
+    replicates = stats.get("_run", {}).get("replicates", 1)
+    for approach in strategies:
+        data = stats[approach]
+        ci = data.get("mean_delay_ci", (data["mean_delay"], data["mean_delay"]))
+        store.log(run_id, generation, approach, {
+            "green_time": plan[approach],
+            "mean_delay": data["mean_delay"],
+            "max_delay": data["max_delay"],
+            "throughput": data["throughput"],
+            "max_queue": data["max_queue"],
+            "mean_trip_delay": data.get("mean_trip_delay", 0),
+            "payoff": payoffs[approach],
+            "strategy_change": adjustments.get(approach, 0),
+            "cache_hits": cache_counts[0],
+            "cache_misses": cache_counts[1],
+            "truncated": truncated,
+            "replicates": replicates,
+            "mean_delay_ci": list(ci),
+            **(extra or {})
+        })
+    if "_series" in stats:
+        series = stats["_series"]
+        store_sink(store, run_id, generation, list(strategies))(series["step"], np.array(series["values"]))
+
+def screen_meso(candidates, fraction, max_workers=None, cache=None, profiler=None):
+    """Indices of the candidates promoted to micro simulation by a meso screen, and every meso cost
+
+    The best fraction by summed meso delay (whole-trip time loss) is
+    promoted; the elite gets no exemption, so a plan the screen ranks low is
+    not simulated microscopically. The meso runs' own sections are merged
+    into profiler as meso.*.
+    """
+    results = evaluate_candidates(candidates, dict(sumo_config, fidelity="meso"), approaches,
+                                  max_workers=max_workers, cache=cache)
+    if profiler is not None:
+        for row in results:
+            if row is not None:
+                profiler.merge({f"meso.{k}": v for k, v in row.get("_profile", {}).items()})
+    costs = [sum(r[a]["mean_delay"] for a in strategies) if r else np.inf for r in results]
+    keep = max(1, int(np.ceil(fraction * len(candidates))))
+    ranked = np.argsort(costs, kind="stable")[:keep]
+    return sorted(map(int, ranked)), costs
+
+def update_max_metrics(stats):
+    """Grow the payoff normalisers to cover the latest statistics"""
+    grow_max_metrics(max_metrics, stats, strategies)
+
+cycle = 0
 
-def init_log():
-    with open(log_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        header = ["Generation", "Approach", "GreenTime"]
-        header += ["MeanDelay", "MaxDelay", "Throughput", "MaxQueue"]
-        header += ["Payoff", "StrategyChange"]
-        writer.writerow(header)
+def adapt_cycle(cycle_stats):
+    """Cycle-by-cycle controller: replicator update from the cycle just finished"""
+    global cycle
+    cycle += 1
+    plan = dict(strategies)
+    new_plan, payoffs, adjustments = replicator_update(cycle_stats, plan, max_metrics, weights,
+                                                       replicator_gain, min_phases, max_phases)
+    strategies.update(new_plan)
+    log_results(cycle, cycle_stats, payoffs, adjustments, plan)
+    return dict(strategies)
 
-def log_results(generation, stats, payoffs, adjustments):
-    with open(log_file, 'a', newline='') as f:
-        writer = csv.writer(f)
+def branch_candidates(cycle_stats, plan, k, rng):
+    """The replicator update of plan plus k-1 mutants of it, tried from the same state"""
+    strategies.update(plan)
+    adapted = adapt_cycle(cycle_stats)
+    candidates = [adapted]
+    for _ in range(k - 1):
+        steps = rng.choice([-mutation_step, 0, mutation_step], size=len(adapted))
+        candidates.append({
+            approach: int(min(max_phases, max(min_phases, green + step)))
+            for (approach, green), step in zip(adapted.items(), steps)
+        })
+    return candidates
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EGT signal timing optimization for J0")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of SUMO worker processes")
+    parser.add_argument("--population", type=int, default=os.cpu_count(),
+                        help="split vectors evolved and evaluated per generation")
+    parser.add_argument("--sumo-bin", default=sumo_config["sumo_bin"],
+                        help="path to the sumo executable")
+    parser.add_argument("--backend", choices=backends, default=sumo_config["backend"],
+                        help="libsumo runs SUMO in-process, traci talks to it over a socket")
+    parser.add_argument("--tls-mode", choices=["runtime", "netfile"], default=sumo_config["tls_mode"],
+                        help="apply splits through TraCI or by rewriting the network file")
+    parser.add_argument("--sumocfg-profile", choices=["lean", "full"], default=sumo_config["sumocfg_profile"],
+                        help="SUMO config of the optimizer runs; the final analysis run always uses full")
+    parser.add_argument("--stepping", choices=["step", "cycle"], default=sumo_config["stepping"],
+                        help="poll metrics every step, or jump cycle to cycle reading generated E2 detectors")
+    parser.add_argument("--demand", choices=["routed", "trips"], default=sumo_config["demand"],
+                        help="pre-route the .sumocfg trips once, or let SUMO route them in every run")
+    parser.add_argument("--no-final", action="store_true",
+                        help="skip the analysis run of the best plan with full reporting")
+    parser.add_argument("--seed", type=int, default=sumo_config["seed"],
+                        help="SUMO random seed shared by every run")
+    parser.add_argument("--series", type=int, default=0,
+                        help="store every Nth step of the logged runs' approach time series (0: none)")
+    parser.add_argument("--profile", action="store_true",
+                        help="count TraCI calls and print each generation's time breakdown")
+    parser.add_argument("--cprofile", type=int, default=0,
+                        help="write a cProfile dump of this generation's evaluation to runs/ "
+                             "(use --workers 1 to include the simulation code)")
+    parser.add_argument("--checkpoint", default=os.path.join(run_dir, "egt_so4_checkpoint.pkl"),
+                        help="optimizer state saved after every generation")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the generations of the run saved in --checkpoint")
+    parser.add_argument("--store", default=store_file,
+                        help="SQLite run store the results are logged to")
+    parser.add_argument("--cache", default="result_cache.sqlite",
+                        help="result cache database ('' disables caching)")
+    parser.add_argument("--race-interval", type=int, default=sumo_config["race_interval"],
+                        help="stop candidates dominated by the incumbent at checkpoints this many steps apart")
+    parser.add_argument("--race-margin", type=float, default=sumo_config["race_margin"],
+                        help="relative margin a candidate's summed mean delay may trail the incumbent's by, "
+                             f"on top of {race_z} standard errors")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="run one simulation, updating the split at every cycle boundary")
+    parser.add_argument("--warmup", type=int, default=0,
+                        help="simulate this many steps once and start every candidate from the saved state")
+    parser.add_argument("--branch", type=int, default=0,
+                        help="cycle-by-cycle control trying this many splits per cycle from a saved state")
+    parser.add_argument("--replicates", type=int, default=1,
+                        help="runs per plan under common seeds (seed, seed+1, ...); 1 runs each plan once")
+    parser.add_argument("--max-replicates", type=int, default=10,
+                        help="replicate budget per plan while its ranking against the best is uncertain")
+    parser.add_argument("--mesosim", type=float, default=0,
+                        help="screen candidates with mesoscopic runs first and simulate this fraction microscopically")
+    parser.add_argument("--meso-audit", type=int, default=5,
+                        help="with --mesosim, simulate every candidate microscopically every this many generations "
+                             "to measure the meso/micro rank correlation (0: never)")
+    parser.add_argument("--surrogate", type=int, default=0,
+                        help="pre-screen this many times the population in mutants with a GP surrogate")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    sumo_config["sumo_bin"] = args.sumo_bin
+    sumo_config["tls_mode"] = args.tls_mode
+    sumo_config["backend"] = args.backend
+    sumo_config["seed"] = args.seed
+    sumo_config["sumocfg_profile"] = args.sumocfg_profile
+    if args.sumocfg_profile == "lean":
+        # Built once here; workers are handed its path instead of rebuilding it for every run
+        sumo_config["lean_sumocfg"] = evaluation_sumocfg(sumo_config["sumocfg"])
+    sumo_config["stepping"] = args.stepping
+    sumo_config["race_interval"] = args.race_interval
+    sumo_config["race_margin"] = args.race_margin
+    store_file = args.store
+    sumo_config["series_every"] = args.series
+    sumo_config["profile"] = args.profile
+    cache = ResultCache(args.cache) if args.cache else None
+    # Build (or validate) the network index once before any worker needs it
+    load_index(sumo_config["net_file"])
+    if args.demand == "routed":
+        sumo_config["route_files"] = [routed_demand(route_files(sumo_config["sumocfg"]), sumo_config["net_file"])]
+        print(f"Demand: {sumo_config['route_files'][0]}")
+
+    if args.warmup:
+        print(f"=== Warm-up: {args.warmup} steps ===")
+        sumo_config["state_file"] = save_warmup(
+            strategies, sumo_config, args.warmup, os.path.join(run_dir, "warmup_state.xml"))
+
+    resume = load_checkpoint(args.checkpoint) if args.resume else None
+    if args.resume and resume is None:
+        print(f"No checkpoint at {args.checkpoint}, starting a new run")
+    if resume and (args.branch or args.adaptive):
+        print("--resume continues generation runs only")
+        resume = None
+    init_log("branch" if args.branch else "adaptive" if args.adaptive else "generations", resume)
+    if args.branch:
+        print(f"=== Cycle-by-cycle branching, {args.branch} splits per cycle ===")
+        rng = np.random.default_rng(args.seed)
+        final_stats, choices = run_branching(
+            dict(strategies), sumo_config, approaches,
+            lambda cycle_stats, plan: branch_candidates(cycle_stats, plan, args.branch, rng))
+        print(f"{cycle} cycles, final split: {choices[-1][1]}")
         for approach in strategies:
-            data = stats[approach]
-            writer.writerow([
-                generation,
-                approach,
-                strategies[approach],
-                data["mean_delay"],
-                data["max_delay"],
-                data["throughput"],
-                data["max_queue"],
-                payoffs[approach],
-                adjustments.get(approach, 0)
-            ])
-
-def update_traffic_light_phases():
-    """Update green durations in osm.net.xml.gz"""
-    with gzip.open("osm.net.xml.gz", "rt", encoding="utf-8") as f:
-        tree = ET.parse(f)
-        root = tree.getroot()
-
-    for tl_logic in root.findall(".//tlLogic"):
-        if tl_logic.get("id") == "J0":
-            phases = tl_logic.findall("phase")
-            phases[0].set("duration", str(strategies["west"]))
-            phases[2].set("duration", str(strategies["south"]))
-            phases[4].set("duration", str(strategies["north"]))
-            phases[6].set("duration", str(strategies["east"]))
-
-    with gzip.open("osm_updated.net.xml.gz", "wb") as f:
-        tree.write(f, encoding="utf-8", xml_declaration=True)
-
-def get_valid_lanes():
-    """Get all valid lane IDs dynamically"""
-    return set(traci.lane.getIDList())  # Corrected method
-
-def get_approach_metrics(valid_lanes):
-    """Collect metrics with lane validation"""
-    metrics = {approach: {
-        "delay": [],
-        "throughput": 0,
-        "queues": []
-    } for approach in approaches}
-
-    # Vehicle data collection
-    for veh_id in traci.vehicle.getIDList():
-        try:
-            lane = traci.vehicle.getLaneID(veh_id)
-            if lane not in valid_lanes:
-                continue
-            # Find approach using edge prefix matching
-            edge = lane.split('_')[0]  # Extract edge from lane ID (e.g., "143870423_0" → "143870423")
-            approach = next(
-                (a for a, data in approaches.items() if edge in data["edges"]),
-                None
-            )
-            if approach:
-                metrics[approach]["delay"].append(traci.vehicle.getTimeLoss(veh_id))
-        except traci.TraCIException:
-            continue
-
-    # Queue length calculation
-    for approach, data in approaches.items():
-        queue_sum = 0
-        max_queue = 0
-        # Get all lanes for the approach's edges
-        for edge in data["edges"]:
-            for lane in valid_lanes:
-                if lane.startswith(f"{edge}_"):
-                    try:
-                        queue = traci.lane.getLastStepHaltingNumber(lane)
-                        queue_sum += queue
-                        max_queue = max(max_queue, queue)
-                    except traci.TraCIException:
-                        continue
-        metrics[approach]["queues"].append(queue_sum)
-        metrics[approach]["max_queue"] = max_queue
-
-    return metrics
-
-def run_simulation():
-    """Run simulation with lane validation"""
-    traci.start([
-        sumo_config["sumo_bin"],
-        "-c", sumo_config["sumocfg"],
-        "--net-file", "osm_updated.net.xml.gz",
-        "--tripinfo-output", "tripinfo.xml"
-    ])
-    
-    # Get valid lanes once at start
-    valid_lanes = get_valid_lanes()
-    
-    metrics = {approach: {
-        "delay": [],
-        "throughput": 0,
-        "queues": [],
-        "max_queue": 0
-    } for approach in approaches}
-
-    for _ in range(sumo_config["simulation_steps"]):
-        traci.simulationStep()
-        current_metrics = get_approach_metrics(valid_lanes)
-        
-        for approach in approaches:
-            metrics[approach]["delay"].extend(current_metrics[approach]["delay"])
-            metrics[approach]["queues"].append(current_metrics[approach]["max_queue"])
-            metrics[approach]["max_queue"] = max(
-                metrics[approach]["max_queue"],
-                current_metrics[approach]["max_queue"]
-            )
-
-    # Throughput calculation
-    tree = ET.parse("tripinfo.xml")
-    root = tree.getroot()
-    for trip in root.findall('tripinfo'):
+            print(f"{approach:<10} | {final_stats[approach]['mean_delay']:>10.1f} | "
+                  f"{final_stats[approach]['max_queue']:>10}")
+        store.close()
+        print(f"Per-cycle results saved to run {run_id} in {store_file}")
+        exit(0)
+
+    if args.adaptive:
+        print("=== Cycle-by-cycle adaptive control ===")
+        final_stats = run_simulation(dict(strategies), sumo_config, approaches,
+                                     on_cycle=adapt_cycle)
+        print(f"{cycle} cycles, final split: {strategies}")
+        for approach in strategies:
+            print(f"{approach:<10} | {final_stats[approach]['mean_delay']:>10.1f} | "
+                  f"{final_stats[approach]['max_queue']:>10}")
+        store.close()
+        print(f"Per-cycle results saved to run {run_id} in {store_file}")
+        exit(0)
+
+    # Common-random-number replicates replace single runs (and racing, whose checkpoints are per seed)
+    scheduler = None
+    if args.replicates > 1:
+        scheduler = ReplicateScheduler(sumo_config, approaches, args.replicates,
+                                       args.max_replicates, args.workers, cache)
+
+    if resume:
+        print(f"=== Resuming run {run_id} after generation {resume['generation']} ===")
+        strategies.update(resume["strategies"])
+        max_metrics.update(resume["max_metrics"])
+        incumbent = resume["incumbent"]
+    else:
+        print("=== Initial Baseline ===")
+        if scheduler:
+            baseline_stats = scheduler.evaluate([dict(strategies)])[0]
+        else:
+            baseline_stats = evaluate_candidates([dict(strategies)], sumo_config, approaches,
+                                                 cache=cache)[0]
+        if baseline_stats is None:
+            print("Critical error during baseline")
+            store.close()
+            exit(1)
+        update_max_metrics(baseline_stats)
+        incumbent = baseline_stats.get("_run", {}).get("checkpoints")
+        log_results(0, baseline_stats,
+                   {a: 0 for a in strategies},
+                   {a: 0 for a in strategies})
+
+    surrogate = None
+    if args.surrogate:
+        # Earlier optimisation runs and cached runs of the same scenario seed the surrogate
+        surrogate = Surrogate(strategies, min_phases, max_phases)
+        surrogate.load_store(store, [r[0] for r in store.runs("egt_so4")
+                                     if r[3].get("mode") == "generations"
+                                     and r[3].get("config_key") == config_key(sumo_config, approaches)])
+        if cache:
+            surrogate.load_cache(cache, config_key(sumo_config, approaches))
+        print(f"Surrogate trained on {len(surrogate.samples)} plans")
+
+    rng = np.random.default_rng(args.seed)
+    population = Population(args.population, strategies, rng, min_phases, max_phases,
+                            mutation_rate, mutation_step, replicator_gain)
+    first = 0
+    if resume:
+        population.plans = resume["plans"]
+        rng.bit_generator.state = resume["rng"]
+        first = resume["generation"]
+
+    def checkpoint(generation):
+        store.flush()
+        save_checkpoint(args.checkpoint, {
+            "run_id": run_id,
+            "generation": generation,
+            "plans": population.plans,
+            "rng": rng.bit_generator.state,
+            "strategies": dict(strategies),
+            "max_metrics": dict(max_metrics),
+            "incumbent": incumbent
+        })
+
+    if not resume:
+        checkpoint(0)
+
+    for generation in range(first, num_generations):
+        print(f"\n=== Generation {generation+1}/{num_generations} ===")
+
         try:
-            lane = trip.get("departLane", "")
-            if lane not in valid_lanes:
+            if surrogate:
+                prescreen(population, surrogate, args.surrogate)
+            # The whole population is simulated at once
+            candidates = population.candidates()
+            profiler = Profiler()
+            promoted, meso_costs = range(len(candidates)), None
+            audit = bool(args.mesosim and args.meso_audit and (generation+1) % args.meso_audit == 0)
+            if args.mesosim:
+                with profiler.section("screen"):
+                    promoted, meso_costs = screen_meso(candidates, args.mesosim, args.workers, cache, profiler)
+                kept = len(promoted)
+                print(f"Meso screen promoted {kept}/{len(candidates)} candidates")
+                if audit:
+                    # The promoted plans alone are range-restricted, which biases their correlation to zero
+                    promoted = range(len(candidates))
+            hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+            dump = os.path.join(run_dir, f"profile_gen{generation+1}.prof")
+            with profiler.section("evaluate"), cprofile_dump(dump if args.cprofile == generation+1 else None):
+                micro_candidates = [candidates[i] for i in promoted]
+                if scheduler:
+                    runs = scheduler.runs
+                    micro_results = scheduler.evaluate(micro_candidates)
+                    print(f"{scheduler.runs - runs} replicate runs")
+                else:
+                    micro_results = evaluate_candidates(micro_candidates, sumo_config, approaches,
+                                                        max_workers=args.workers, cache=cache,
+                                                        incumbent=incumbent)
+            # Candidates screened out stay unevaluated and are masked out like failed runs
+            results = [None] * len(candidates)
+            for i, row in zip(promoted, micro_results):
+                results[i] = row
+
+            fidelity = {}
+            if meso_costs is not None:
+                pairs = []
+                for i, candidate in enumerate(candidates):
+                    store.log_candidate(run_id, generation+1, i, "meso", meso_costs[i], candidate)
+                    row = results[i]
+                    if row is not None and not row["_run"]["truncated"]:
+                        # Ranked on trip delay, the same quantity as the meso cost
+                        cost = sum(row[a]["mean_trip_delay"] for a in strategies)
+                        store.log_candidate(run_id, generation+1, i, "micro", cost, candidate)
+                        pairs.append((meso_costs[i], cost))
+                fidelity = {"meso_promoted": kept}
+                if audit:
+                    rho = rank_correlation(*zip(*pairs)) if pairs else float("nan")
+                    fidelity["meso_rank_correlation"] = rho
+                    print(f"Meso/micro rank correlation over all {len(pairs)} candidates: {rho:.2f}")
+            cache_counts = (cache.hits - hits, cache.misses - misses) if cache else (0, 0)
+            arrays, valid = stats_arrays(results, population.order)
+            evaluated = sum(stats is not None for stats in results)
+            stopped = [i for i, row in enumerate(results) if row is not None and row["_run"]["truncated"]]
+            truncated = len(stopped)
+            if not valid.any():
+                print(f"Error in generation {generation+1}: no candidate finished")
                 continue
-            approach = next(
-                (a for a, data in approaches.items() if lane in data["lanes"]),
-                None
-            )
-            if approach:
-                metrics[approach]["throughput"] += 1
-        except Exception:
-            continue
-
-    traci.close()
-
-    # Process metrics
-    stats = {}
-    for approach in approaches:
-        delays = metrics[approach]["delay"]
-        queues = metrics[approach]["queues"]
-        
-        stats[approach] = {
-            "mean_delay": np.mean(delays) if delays else 0,
-            "max_delay": np.max(delays) if delays else 0,
-            "throughput": metrics[approach]["throughput"],
-            "mean_queue": np.mean(queues) if queues else 0,
-            "max_queue": metrics[approach]["max_queue"]
-        }
-        
-        max_metrics["delay"] = max(max_metrics["delay"], stats[approach]["max_delay"])
-        max_metrics["throughput"] = max(max_metrics["throughput"], stats[approach]["throughput"])
-        max_metrics["queue"] = max(max_metrics["queue"], stats[approach]["max_queue"])
-
-    return stats
-
-# Rest of the code remains the same from previous version for:
-# - calculate_payoffs()
-# - evolve_strategies()
-# - main optimization loop
-
-# [Main execution code remains identical to previous version]
-# [Only the metric collection and lane validation changed]
-
-# Initialize and run
-init_log()
-print("=== Initial Baseline ===")
-update_traffic_light_phases()
-try:
-    baseline_stats = run_simulation()
-    log_results(0, baseline_stats, 
-               {a: 0 for a in strategies}, 
-               {a: 0 for a in strategies})
-except Exception as e:
-    print(f"Critical error during baseline: {str(e)}")
-    exit(1)
-
-for generation in range(num_generations):
-    print(f"\n=== Generation {generation+1}/{num_generations} ===")
-    
-    try:
-        update_traffic_light_phases()
-        stats = run_simulation()
-        payoffs = calculate_payoffs(stats)
-        adjustments = evolve_strategies(payoffs)
-        log_results(generation+1, stats, payoffs, adjustments)
-        
-        # Display results
-        print(f"{'Approach':<10} | {'GreenTime':>10} | {'MeanDelay':>10} | {'Throughput':>10} | {'MaxQueue':>10}")
-        for approach in strategies:
-            print(f"{approach:<10} | {strategies[approach]:>10} | "
-                  f"{stats[approach]['mean_delay']:>10.1f} | "
-                  f"{stats[approach]['throughput']:>10} | "
-                  f"{stats[approach]['max_queue']:>10}")
-    
-    except Exception as e:
-        print(f"Error in generation {generation+1}: {str(e)}")
-        continue
-
-print("\nOptimization complete! Results saved to", log_file)
\ No newline at end of file
+
+            if surrogate:
+                for candidate, ok, row in zip(candidates, valid, results):
+                    if ok:
+                        surrogate.add_stats(candidate, row)
+
+            with profiler.section("evolve"):
+                max_metrics["delay"] = max(max_metrics["delay"], arrays["max_delay"][valid].max())
+                max_metrics["throughput"] = max(max_metrics["throughput"], arrays["throughput"][valid].max())
+                max_metrics["queue"] = max(max_metrics["queue"], arrays["max_queue"][valid].max())
+                payoff_rows = payoff_matrix(arrays, weights, max_metrics)
+
+                best = int(np.argmin(np.where(valid, arrays["mean_delay"].sum(axis=1), np.inf)))
+                stats = results[best]
+                incumbent = stats.get("_run", {}).get("checkpoints") or incumbent
+                log_strategies = candidates[best]
+                strategies.update(log_strategies)
+                adjustment_rows = population.evolve(arrays, valid, payoff_rows)
+                payoffs = dict(zip(population.order, payoff_rows[best]))
+                adjustments = dict(zip(population.order, np.round(adjustment_rows[best], 2)))
+            with profiler.section("log"):
+                log_results(generation+1, stats, payoffs, adjustments, log_strategies, cache_counts,
+                            truncated, dict(fidelity, truncated_candidates=stopped))
+
+            # Simulation sections are summed over every run of the generation
+            for row in results:
+                if row is not None:
+                    profiler.merge({f"sim.{k}": v for k, v in row.get("_profile", {}).items()})
+            store.log_profile(run_id, generation+1, profiler.report())
+            if args.profile:
+                print(profiler.table())
+
+            # Display results
+            print(f"{evaluated}/{len(candidates)} candidates evaluated, {truncated} stopped early "
+                  f"(cache: {cache_counts[0]} hits, {cache_counts[1]} misses)")
+            if stopped:
+                print("Stopped early: " + ", ".join(f"#{i} {candidates[i]}" for i in stopped))
+            print(f"{'Approach':<10} | {'GreenTime':>10} | {'MeanDelay':>10} | {'Throughput':>10} | {'MaxQueue':>10}")
+            for approach in strategies:
+                print(f"{approach:<10} | {log_strategies[approach]:>10} | "
+                      f"{stats[approach]['mean_delay']:>10.1f} | "
+                      f"{stats[approach]['throughput']:>10} | "
+                      f"{stats[approach]['max_queue']:>10}")
+
+            # Only a completed generation is checkpointed; --resume repeats a failed one
+            checkpoint(generation+1)
+
+        except Exception as e:
+            print(f"Error in generation {generation+1}: {str(e)}")
+
+    if not args.no_final:
+        # Outputs (tripinfo, statistics, queues) are only wanted for the final plan
+        print("\n=== Analysis run of the final plan (full reporting) ===")
+        final_config = dict(sumo_config, sumocfg_profile="full", tripinfo=True, race_interval=0)
+        final_label = f"final_{os.getpid()}"
+        final_stats = run_simulation(dict(strategies), final_config, approaches, label=final_label)
+        print(f"Trip info written to {worker_paths(final_label)['tripinfo']}")
+        print(f"Summed mean delay: {sum(final_stats[a]['mean_delay'] for a in strategies):.2f} s")
+
+    store.close()
+    print(f"\nOptimization complete! Results saved to run {run_id} in {store_file}")
@@ -0,0 +1,174 @@
+import argparse
+import csv
+
+import numpy as np
+import traci.constants as tc
+
+from sumo_backend import backends, start as start_sumo
+
+
+def green_phase_indices(logic):
+    """Indices of the phases that give right of way (some G/g, no yellow)"""
+    return [
+        i for i, phase in enumerate(logic.phases)
+        if any(c in "Gg" for c in phase.state) and "y" not in phase.state.lower()
+    ]
+
+
+def active_logic(conn, tls_id):
+    program = conn.trafficlight.getProgram(tls_id)
+    return next(l for l in conn.trafficlight.getAllProgramLogics(tls_id) if l.programID == program)
+
+
+class CorridorController:
+    """One replicator game per traffic light, discovered from the running network
+
+    Players are the green phases of each junction. Approach lanes and the
+    phases that serve them come from getControlledLanes and the phase states,
+    so nothing is tied to J0. Halting numbers of every controlled lane and the
+    phase of every light arrive in two batched subscription responses per
+    step whatever the number of junctions; payoffs and new splits for all
+    junctions finishing a cycle are computed in one masked array pass.
+    """
+
+    def __init__(self, conn, tls_ids=None, min_green=10, max_green=60, gain=8):
+        self.conn = conn
+        self.min_green = min_green
+        self.max_green = max_green
+        self.gain = gain
+        self.tls_ids = list(tls_ids or conn.trafficlight.getIDList())
+
+        self.logics = [active_logic(conn, t) for t in self.tls_ids]
+        self.green = [green_phase_indices(logic) for logic in self.logics]
+        width = max((len(g) for g in self.green), default=0)
+
+        # Junction x phase matrices, padded to the widest junction
+        self.mask = np.zeros((len(self.tls_ids), width), dtype=bool)
+        self.splits = np.zeros((len(self.tls_ids), width))
+        self.lanes = []
+        lane_index = {}
+        incidence = []
+        for j, (tls_id, logic, green) in enumerate(zip(self.tls_ids, self.logics, self.green)):
+            controlled = conn.trafficlight.getControlledLanes(tls_id)
+            for p, phase_index in enumerate(green):
+                self.mask[j, p] = True
+                self.splits[j, p] = logic.phases[phase_index].duration
+                state = logic.phases[phase_index].state
+                for link, lane in enumerate(controlled):
+                    if state[link] in "Gg":
+                        if lane not in lane_index:
+                            lane_index[lane] = len(self.lanes)
+                            self.lanes.append(lane)
+                        incidence.append((lane_index[lane], j, p))
+
+        # Sparse lane -> (junction, phase) incidence, used to fold lane queues into phase payoffs
+        incidence = sorted(set(incidence))
+        self.inc_lane = np.array([i[0] for i in incidence], dtype=int)
+        self.inc_junction = np.array([i[1] for i in incidence], dtype=int)
+        self.inc_phase = np.array([i[2] for i in incidence], dtype=int)
+        self.queue_sum = np.zeros(len(self.lanes))
+        self.last_phase = np.full(len(self.tls_ids), -1)
+        self.cycles = np.zeros(len(self.tls_ids), dtype=int)
+
+        for lane in self.lanes:
+            conn.lane.subscribe(lane, [tc.LAST_STEP_VEHICLE_HALTING_NUMBER])
+        for tls_id in self.tls_ids:
+            conn.trafficlight.subscribe(tls_id, [tc.TL_CURRENT_PHASE])
+
+    def step(self):
+        """Account for the last simulation step and start new cycles where they are due"""
+        lanes = self.conn.lane.getAllSubscriptionResults()
+        self.queue_sum += [lanes[lane][tc.LAST_STEP_VEHICLE_HALTING_NUMBER] for lane in self.lanes]
+
+        lights = self.conn.trafficlight.getAllSubscriptionResults()
+        phase = np.array([lights[t][tc.TL_CURRENT_PHASE] for t in self.tls_ids])
+        first = np.array([g[0] if g else -1 for g in self.green])
+        boundary = (phase == first) & (self.last_phase != first) & (self.last_phase >= 0)
+        self.last_phase = phase
+        if boundary.any():
+            self.update(boundary)
+
+    def update(self, boundary):
+        """Replicator step for every junction in the boundary mask at once"""
+        pressure = np.zeros(self.splits.shape)
+        np.add.at(pressure, (self.inc_junction, self.inc_phase), self.queue_sum[self.inc_lane])
+        # Reset the queue accumulators of the lanes served by the updated junctions
+        self.queue_sum[self.inc_lane[boundary[self.inc_junction]]] = 0
+
+        totals = np.where(self.mask, pressure, 0).sum(axis=1, keepdims=True)
+        counts = self.mask.sum(axis=1, keepdims=True)
+        even = np.broadcast_to(1 / np.maximum(counts, 1), pressure.shape).copy()
+        ratios = np.divide(pressure, totals, out=even, where=totals > 1e-6)
+        adjustments = self.gain * (ratios * counts - 1)
+        new_splits = np.clip(self.splits + adjustments, self.min_green, self.max_green)
+        update = boundary[:, None] & self.mask
+        self.splits = np.where(update, new_splits, self.splits)
+        self.cycles += boundary
+
+        for j in np.flatnonzero(boundary):
+            self.apply(j)
+
+    def apply(self, j):
+        tls_id, logic = self.tls_ids[j], self.logics[j]
+        durations = np.rint(self.splits[j]).astype(int)
+        for p, phase_index in enumerate(self.green[j]):
+            phase = logic.phases[phase_index]
+            phase.duration = phase.minDur = phase.maxDur = int(durations[p])
+        logic.currentPhaseIndex = self.conn.trafficlight.getPhase(tls_id)
+        self.conn.trafficlight.setProgramLogic(tls_id, logic)
+        # The boundary is seen a step into the first phase; only the rest of its green remains
+        spent = self.conn.trafficlight.getSpentDuration(tls_id)
+        self.conn.trafficlight.setPhaseDuration(tls_id, max(int(durations[0]) - spent, 0))
+
+    def current_splits(self):
+        return {
+            tls_id: [int(round(d)) for d in self.splits[j][self.mask[j]]]
+            for j, tls_id in enumerate(self.tls_ids)
+        }
+
+
+def run_corridor(sumo_bin, sumocfg, net_file, steps, log_file, backend="auto"):
+    """Run every traffic light of the network under its own EGT game in one simulation"""
+    conn = start_sumo([
+        sumo_bin, "-c", sumocfg,
+        "--net-file", net_file,
+        "--tripinfo-output", "NUL"
+    ], backend, label="corridor")
+    try:
+        controller = CorridorController(conn)
+        print(f"Controlling {len(controller.tls_ids)} traffic lights, "
+              f"{len(controller.lanes)} approach lanes")
+        with open(log_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Time", "Junction", "Cycle", "GreenTimes"])
+            cycles = controller.cycles.copy()
+            for _ in range(steps):
+                conn.simulationStep()
+                controller.step()
+                changed = np.flatnonzero(controller.cycles != cycles)
+                if len(changed):
+                    splits = controller.current_splits()
+                    for j in changed:
+                        tls_id = controller.tls_ids[j]
+                        writer.writerow([conn.simulation.getTime(), tls_id, controller.cycles[j],
+                                         " ".join(map(str, splits[tls_id]))])
+                    cycles = controller.cycles.copy()
+        return controller.current_splits()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EGT control of every traffic light in the network")
+    parser.add_argument("--sumo-bin", default="sumo")
+    parser.add_argument("--sumocfg", default="osm.sumocfg")
+    parser.add_argument("--net-file", default="osm.net.xml.gz")
+    parser.add_argument("--steps", type=int, default=3600)
+    parser.add_argument("--log", default="corridor_log.csv")
+    parser.add_argument("--backend", choices=backends, default="auto")
+    args = parser.parse_args()
+
+    splits = run_corridor(args.sumo_bin, args.sumocfg, args.net_file, args.steps, args.log,
+                          args.backend)
+    for tls_id, greens in splits.items():
+        print(f"{tls_id}: {greens}")
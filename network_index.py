@@ -0,0 +1,116 @@
+import os
+import sys
+import gzip
+import time
+import pickle
+from xml.etree import ElementTree as ET
+
+from result_cache import file_digest
+
+index_version = 1
+_loaded = {}
+
+
+def index_path(net_file):
+    return net_file + ".index.pkl"
+
+
+def build_index(net_file):
+    """Parse a SUMO network once into plain dicts
+
+    tl_logics:      tls id -> type, programID, offset and phases
+    lanes:          lane id -> edge, index, length (internal lanes excluded)
+    edge_lanes:     edge id -> lane ids in index order
+    controlled:     tls id -> [(linkIndex, from lane, to lane, via lane)] sorted by linkIndex
+    """
+    index = {"tl_logics": {}, "lanes": {}, "edge_lanes": {}, "controlled": {}}
+    opener = gzip.open if net_file.endswith(".gz") else open
+    with opener(net_file, "rb") as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "edge" and elem.get("function") != "internal":
+                edge = elem.get("id")
+                lanes = elem.findall("lane")
+                index["edge_lanes"][edge] = [lane.get("id") for lane in lanes]
+                for lane in lanes:
+                    index["lanes"][lane.get("id")] = {
+                        "edge": edge,
+                        "index": int(lane.get("index")),
+                        "length": float(lane.get("length"))
+                    }
+                elem.clear()
+            elif elem.tag == "tlLogic":
+                index["tl_logics"][elem.get("id")] = {
+                    "type": elem.get("type"),
+                    "programID": elem.get("programID"),
+                    "offset": float(elem.get("offset", 0)),
+                    "phases": [
+                        {key: phase.get(key) for key in ("duration", "state", "minDur", "maxDur")
+                         if phase.get(key) is not None}
+                        for phase in elem.findall("phase")
+                    ]
+                }
+                elem.clear()
+            elif elem.tag == "connection" and elem.get("tl") is not None:
+                index["controlled"].setdefault(elem.get("tl"), []).append((
+                    int(elem.get("linkIndex")),
+                    f"{elem.get('from')}_{elem.get('fromLane')}",
+                    f"{elem.get('to')}_{elem.get('toLane')}",
+                    elem.get("via")
+                ))
+                elem.clear()
+            elif elem.tag == "junction":
+                elem.clear()
+    for links in index["controlled"].values():
+        links.sort()
+    return index
+
+
+def load_index(net_file):
+    """Network index of net_file, rebuilt only when the file's hash changes"""
+    digest = file_digest(net_file)
+    if _loaded.get(net_file, (None,))[0] == digest:
+        return _loaded[net_file][1]
+
+    path = index_path(net_file)
+    index = None
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            stored = pickle.load(f)
+        if stored.get("version") == index_version and stored.get("digest") == digest:
+            index = stored["index"]
+    if index is None:
+        index = build_index(net_file)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": index_version, "digest": digest, "index": index}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    _loaded[net_file] = (digest, index)
+    return index
+
+
+def lane_approach(index, approaches):
+    """lane -> approach for the approach edges of either approaches layout"""
+    mapping = {}
+    for approach, data in approaches.items():
+        edges = data["edges"] if isinstance(data, dict) else data
+        for edge in edges:
+            for lane in index["edge_lanes"].get(edge, ()):
+                mapping[lane] = approach
+    return mapping
+
+
+if __name__ == "__main__":
+    net_file = sys.argv[1] if len(sys.argv) > 1 else "osm.net.xml.gz"
+    start = time.perf_counter()
+    build_index(net_file)
+    parsed = time.perf_counter() - start
+    load_index(net_file)
+    _loaded.clear()
+    start = time.perf_counter()
+    index = load_index(net_file)
+    loaded = time.perf_counter() - start
+    print(f"{net_file}: {len(index['edge_lanes'])} edges, {len(index['lanes'])} lanes, "
+          f"{len(index['tl_logics'])} traffic lights")
+    print(f"Full parse {parsed * 1000:.1f} ms, index load {loaded * 1000:.1f} ms -> {index_path(net_file)}")
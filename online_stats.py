@@ -0,0 +1,154 @@
+import numpy as np
+
+
+class RunningStats:
+    """Count, mean, standard deviation, min and max of a stream in O(1) memory
+
+    Values are folded in with Welford's update; add_many() folds a whole
+    array at once and merge() combines two accumulators exactly (Chan et
+    al.), so per-step, per-cycle and per-worker accumulators add up to the
+    same numbers as a single pass over every value.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size:
+            batch = RunningStats()
+            batch.count = int(values.size)
+            batch.mean = float(values.mean())
+            batch.m2 = float(((values - batch.mean) ** 2).sum())
+            batch.min = float(values.min())
+            batch.max = float(values.max())
+            self.merge(batch)
+        return self
+
+    def merge(self, other):
+        """Fold in another accumulator, as if its values had been added here"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        result = RunningStats()
+        result.merge(self)
+        return result
+
+    @property
+    def total(self):
+        return self.mean * self.count
+
+    @property
+    def std(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0, "mean": 0, "std": 0, "min": 0, "max": 0}
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+
+
+class QuantileSketch:
+    """RunningStats plus approximate percentiles from a fixed-width histogram
+
+    Values are binned at bin_width up to limit; anything beyond the last bin
+    is counted there, while count, mean, min and max stay exact. Sketches
+    with the same bins merge exactly by adding their counts.
+    """
+
+    def __init__(self, bin_width=0.5, limit=3600):
+        self.bin_width = bin_width
+        self.bins = np.zeros(int(limit / bin_width) + 1, dtype=np.int64)
+        self.moments = RunningStats()
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def add(self, value):
+        index = min(int(value / self.bin_width), len(self.bins) - 1)
+        self.bins[max(index, 0)] += 1
+        self.moments.add(value)
+        return self
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size:
+            index = np.clip((values / self.bin_width).astype(np.int64), 0, len(self.bins) - 1)
+            self.bins += np.bincount(index, minlength=len(self.bins))
+            self.moments.add_many(values)
+        return self
+
+    def merge(self, other):
+        if other.bin_width != self.bin_width or len(other.bins) != len(self.bins):
+            raise ValueError("Only sketches with the same bins can be merged")
+        self.bins += other.bins
+        self.moments.merge(other.moments)
+        return self
+
+    def copy(self):
+        result = QuantileSketch.__new__(QuantileSketch)
+        result.bin_width = self.bin_width
+        result.bins = self.bins.copy()
+        result.moments = self.moments.copy()
+        return result
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = q / 100 * self.count
+        index = int(np.searchsorted(np.cumsum(self.bins), rank, side="left"))
+        value = (index + 0.5) * self.bin_width
+        return min(max(value, self.moments.min), self.moments.max)
+
+    def summary(self, percentiles=(50, 90, 95)):
+        stats = self.moments.summary()
+        for q in percentiles:
+            stats[f"p{q}"] = self.percentile(q)
+        return stats
+
+
+def ranks(values):
+    """Ranks from 1, ties sharing their average rank"""
+    values = np.asarray(values, dtype=float)
+    order = np.argsort(values, kind="stable")
+    result = np.empty(len(values))
+    result[order] = np.arange(1, len(values) + 1)
+    for value in np.unique(values):
+        tied = values == value
+        result[tied] = result[tied].mean()
+    return result
+
+
+def rank_correlation(a, b):
+    """Spearman rank correlation of two equally long samples (nan below three pairs or without spread)"""
+    if len(a) < 3:
+        return float("nan")
+    ra, rb = ranks(a), ranks(b)
+    if ra.std() == 0 or rb.std() == 0:
+        return float("nan")
+    return float(np.corrcoef(ra, rb)[0, 1])
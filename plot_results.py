@@ -1,8 +1,30 @@
+import argparse
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from run_store import RunStore
+
+parser = argparse.ArgumentParser(description="Plot mean delay per generation of one optimisation run")
+parser.add_argument("--store", default="runs.sqlite")
+parser.add_argument("--run", type=int, help="run id (default: the latest run)")
+parser.add_argument("--csv", help="plot a CSV log such as results.csv instead of the run store")
+args = parser.parse_args()
+
 # Load the data
-df = pd.read_csv('results.csv')
+if args.csv:
+    df = pd.read_csv(args.csv)
+else:
+    store = RunStore(args.store)
+    run_id = args.run or store.runs()[-1][0]
+    df = pd.DataFrame(store.generations([run_id])).rename(columns={
+        "generation": "Generation", "approach": "Approach",
+        "green_time": "GreenTime", "mean_delay": "MeanDelay"
+    })
+    store.close()
+if 'Strategy' not in df:
+    df['Strategy'] = df['Generation'].map(lambda g: 'Fixed' if g == 0 else 'EGT')
+last = df['Generation'].max()
 
 # Custom color palette
 colors = {'west': '#1f77b4', 'south': '#ff7f0e', 'north': '#2ca02c', 'east': '#d62728'}
@@ -20,7 +42,7 @@ for approach in df['Approach'].unique():
                 color=colors[approach], marker='o', s=100,
                 label=f'{approach} (Fixed)' if approach == 'west' else "")
     
-    # Plot EGT strategy (generations 1-10)
+    # Plot EGT strategy (generations 1 onwards)
     egt = approach_data[approach_data['Strategy'] == 'EGT']
     plt.plot(egt['Generation'], egt['MeanDelay'], 
              color=colors[approach], linestyle='--', marker='^', 
@@ -30,12 +52,12 @@ for approach in df['Approach'].unique():
 plt.title('Traffic Signal Optimization Results', fontsize=14, fontweight='bold')
 plt.xlabel('Generation', fontsize=12)
 plt.ylabel('Mean Delay (seconds)', fontsize=12)
-plt.xticks(range(0, 11))
+plt.xticks(range(0, int(last) + 1))
 plt.grid(True, linestyle='--', alpha=0.7)
 plt.legend(ncol=2, frameon=True, fontsize=10)
 
 # Add annotations
-plt.text(0.5, -0.15, f"Throughput remains 0 for all approaches\nFinal strategies: {dict(df[df['Generation'] == 10].groupby('Approach')['GreenTime'].first())}",
+plt.text(0.5, -0.15, f"Final strategies: {dict(df[df['Generation'] == last].groupby('Approach')['GreenTime'].first())}",
          ha='center', va='center', transform=plt.gca().transAxes, fontsize=9)
 
 plt.tight_layout()
@@ -0,0 +1,118 @@
+import numpy as np
+
+
+def stats_arrays(results, order):
+    """Stack per-candidate stats into N x A arrays plus a mask of usable rows
+
+    Failed (None) and truncated runs are masked out and filled with zeros.
+    """
+    n, a = len(results), len(order)
+    arrays = {key: np.zeros((n, a)) for key in ("mean_delay", "max_delay", "throughput", "max_queue")}
+    valid = np.zeros(n, dtype=bool)
+    for i, stats in enumerate(results):
+        if stats is None or stats.get("_run", {}).get("truncated"):
+            continue
+        valid[i] = True
+        for key, array in arrays.items():
+            array[i] = [stats[approach][key] for approach in order]
+    return arrays, valid
+
+
+def payoff_matrix(arrays, weights, max_metrics):
+    """Weighted, normalised payoff of every approach of every candidate (N x A)"""
+    return (
+        weights["delay"] * arrays["mean_delay"] / max_metrics["delay"]
+        + weights["throughput"] * arrays["throughput"] / max_metrics["throughput"]
+        + weights["queue"] * arrays["max_queue"] / max_metrics["queue"]
+    )
+
+
+def replicator_adjustments(payoffs, gain):
+    """Green time change of every approach (N x A): approaches above their plan's mean payoff gain green"""
+    totals = payoffs.sum(axis=1, keepdims=True)
+    ratios = np.divide(payoffs, totals, out=np.full_like(payoffs, 1 / payoffs.shape[1]),
+                       where=totals > 1e-6)
+    return gain * (ratios * payoffs.shape[1] - 1)
+
+
+def grow_max_metrics(max_metrics, stats, order):
+    """Grow the payoff normalisers in place to cover the stats of one run or cycle"""
+    for approach in order:
+        max_metrics["delay"] = max(max_metrics["delay"], stats[approach]["max_delay"])
+        max_metrics["throughput"] = max(max_metrics["throughput"], stats[approach]["throughput"])
+        max_metrics["queue"] = max(max_metrics["queue"], stats[approach]["max_queue"])
+
+
+def replicator_update(stats, plan, max_metrics, weights, gain=8, min_phases=10, max_phases=60):
+    """Replicator step of a single plan from its stats, as taken between cycles
+
+    max_metrics is grown in place first. Adjustments are truncated to whole
+    seconds. Returns the new plan, the payoffs and the adjustments, each a
+    dict by approach.
+    """
+    order = list(plan)
+    grow_max_metrics(max_metrics, stats, order)
+    arrays = {key: np.array([[stats[approach][key] for approach in order]])
+              for key in ("mean_delay", "throughput", "max_queue")}
+    payoffs = payoff_matrix(arrays, weights, max_metrics)
+    steps = replicator_adjustments(payoffs, gain)[0]
+    adjustments = {approach: int(step) for approach, step in zip(order, steps)}
+    new_plan = {approach: max(min_phases, min(max_phases, plan[approach] + adjustments[approach]))
+                for approach in order}
+    return new_plan, dict(zip(order, map(float, payoffs[0]))), adjustments
+
+
+class Population:
+    """N candidate split vectors (N x A green times) evolved with array operations
+
+    Each generation every plan takes a replicator step on its own payoffs,
+    plans are resampled in proportion to their fitness (lower summed mean
+    delay is fitter), then mutated and clamped. Green times stay continuous
+    and are only rounded when handed to SUMO, so small adjustments
+    accumulate instead of truncating to zero.
+    """
+
+    def __init__(self, size, initial, rng, min_phases=10, max_phases=60,
+                 mutation_rate=0.1, mutation_step=3, replicator_gain=8):
+        self.order = list(initial)
+        self.rng = rng
+        self.min_phases = min_phases
+        self.max_phases = max_phases
+        self.mutation_rate = mutation_rate
+        self.mutation_step = mutation_step
+        self.replicator_gain = replicator_gain
+
+        self.plans = np.tile(np.array([initial[a] for a in self.order], dtype=float), (size, 1))
+        # Keep the seed plan as the first individual and spread the rest around it
+        self.plans[1:] = self.mutate(self.plans[1:], rate=1.0)
+
+    def candidates(self):
+        """Plans as strategies dicts of whole seconds, ready for evaluate_candidates()"""
+        rounded = np.rint(self.plans).astype(int)
+        return [dict(zip(self.order, map(int, row))) for row in rounded]
+
+    def mutate(self, plans, rate=None):
+        rate = self.mutation_rate if rate is None else rate
+        mask = self.rng.random(plans.shape) < rate
+        steps = self.rng.choice([-self.mutation_step, self.mutation_step], size=plans.shape)
+        return np.clip(plans + mask * steps, self.min_phases, self.max_phases)
+
+    def replicator_step(self, payoffs):
+        """Approaches above their plan's mean payoff gain green, those below lose it"""
+        return replicator_adjustments(payoffs, self.replicator_gain)
+
+    def evolve(self, arrays, valid, payoffs):
+        """Advance one generation from evaluated stats; returns the per-plan adjustments"""
+        adjustments = np.where(valid[:, None], self.replicator_step(payoffs), 0)
+        plans = np.clip(self.plans + adjustments, self.min_phases, self.max_phases)
+
+        cost = arrays["mean_delay"].sum(axis=1)
+        fitness = np.where(valid, 1 / (1 + cost), 0)
+        if fitness.sum() > 0:
+            best = int(np.argmax(fitness))
+            parents = self.rng.choice(len(plans), size=len(plans) - 1, p=fitness / fitness.sum())
+            # Elitism: the best plan survives unmutated
+            self.plans = np.vstack([plans[best], self.mutate(plans[parents])])
+        else:
+            self.plans = self.mutate(plans)
+        return adjustments
@@ -0,0 +1,128 @@
+import time
+import inspect
+import cProfile
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Wall time and call count of named sections of a run
+
+    Timing a section costs two perf_counter() calls, cheap enough to wrap
+    every simulation step. Totals from several runs (or worker processes)
+    are combined with merge().
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def add(self, name, seconds, calls=1):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name, function):
+        """function wrapped so every call is added to section name"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return wrapper
+
+    def merge(self, profile):
+        """Add the totals of another Profiler or of its report()"""
+        if isinstance(profile, Profiler):
+            profile = profile.report()
+        for name, (seconds, calls) in profile.items():
+            self.add(name, seconds, calls)
+
+    def report(self):
+        """{section: [seconds, calls]}, JSON friendly"""
+        return {name: [self.seconds[name], self.calls[name]] for name in self.seconds}
+
+    def table(self):
+        """Sections by descending time, one line each
+
+        Merged sections named prefix.name (the runs' own sections, summed over
+        worker processes) overlap the top-level ones, so each prefix gets a
+        table of its own and percentages are of that table's total.
+        """
+        groups = {}
+        for name in self.seconds:
+            groups.setdefault(name.split(".", 1)[0] if "." in name else "", []).append(name)
+        lines = []
+        for prefix in sorted(groups):
+            names = sorted(groups[prefix], key=self.seconds.get, reverse=True)
+            total = sum(self.seconds[name] for name in names) or 1.0
+            if prefix:
+                lines.append(f"[{prefix}]")
+            for name in names:
+                seconds, calls = self.seconds[name], self.calls[name]
+                lines.append(f"{name:<16} | {seconds:>8.3f} s | {100 * seconds / total:>5.1f}% | {calls:>8} calls")
+        return "\n".join(lines)
+
+
+class CountingConnection:
+    """Wraps a TraCI connection (or the libsumo module) and counts the commands sent through it
+
+    conn.vehicle.getIDList() and friends are counted per domain in calls;
+    anything that is not a domain method passes through unchanged.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._conn, name)
+        if hasattr(attribute, "subscribe") and not inspect.isroutine(attribute):
+            return _CountingDomain(self, name, attribute)
+        if inspect.isroutine(attribute):
+            return self._counted(name, attribute)
+        return attribute
+
+    def _counted(self, name, function):
+        def wrapper(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+class _CountingDomain:
+    def __init__(self, owner, name, domain):
+        self._owner = owner
+        self._name = name
+        self._domain = domain
+
+    def __getattr__(self, name):
+        attribute = getattr(self._domain, name)
+        if inspect.isroutine(attribute):
+            return self._owner._counted(f"{self._name}.{name}", attribute)
+        return attribute
+
+
+@contextmanager
+def cprofile_dump(path):
+    """cProfile the enclosed block and write the stats to path (None profiles nothing)"""
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
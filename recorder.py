@@ -0,0 +1,124 @@
+import numpy as np
+
+from online_stats import QuantileSketch
+
+# Per-step series kept for every approach
+series_fields = ["queue", "halting", "mean_time_loss"]
+
+
+class ApproachRecorder:
+    """Per-approach metrics of a run (or of one cycle) in bounded memory
+
+    Fed one collector step at a time. A vehicle's time loss is counted once,
+    with the value it had on the last step it was seen on the approach, so
+    only the vehicles currently on an approach are held. Delays and the
+    per-step longest queue go to online_stats accumulators, which merge
+    exactly across cycles and workers. The per-step series (longest lane queue, halting
+    vehicles and mean time loss of the vehicles present) of every every-th
+    step goes to a ring buffer of capacity rows; with a sink, a full buffer is
+    handed to it before being reused, otherwise the oldest rows are
+    overwritten.
+    """
+
+    def __init__(self, approaches, capacity=0, every=1, sink=None):
+        self.approaches = list(approaches)
+        n = len(self.approaches)
+        self.present = [{} for _ in range(n)]
+        self.delay = [QuantileSketch() for _ in range(n)]
+        self.queue = [QuantileSketch(bin_width=1, limit=1000) for _ in range(n)]
+        self.steps = 0
+
+        self.every = max(every, 1)
+        self.sink = sink
+        self.series_steps = np.zeros(capacity, dtype=int)
+        self.series = np.zeros((capacity, len(series_fields), n))
+        self.head = 0
+        self.filled = 0
+
+    def add(self, current, step=None):
+        """Fold one step of collector output into the recorder"""
+        self.steps += 1
+        record = len(self.series) and (self.steps - 1) % self.every == 0
+        for i, approach in enumerate(self.approaches):
+            data = current[approach]
+            vehicles = data["vehicles"]
+            present = self.present[i]
+            for veh_id in present.keys() - vehicles.keys():
+                self.delay[i].add(present.pop(veh_id))
+            present.update(vehicles)
+
+            self.queue[i].add(data["max_queue"])
+            if record:
+                mean_loss = sum(vehicles.values()) / len(vehicles) if vehicles else 0.0
+                self.series[self.head, :, i] = (data["max_queue"], data["halting"], mean_loss)
+
+        if record:
+            self.series_steps[self.head] = self.steps if step is None else step
+            self.head = (self.head + 1) % len(self.series)
+            self.filled = min(self.filled + 1, len(self.series))
+            if self.head == 0 and self.sink is not None:
+                self.flush()
+
+    def flush(self):
+        """Hand the buffered series to the sink and empty the buffer"""
+        if self.sink is not None and self.filled:
+            self.sink(*self.series_data())
+        self.head = self.filled = 0
+
+    def series_data(self):
+        """Buffered (steps, series) in time order; series is rows x fields x approaches"""
+        order = (np.arange(self.filled) + self.head - self.filled) % len(self.series) if self.filled else []
+        return self.series_steps[order], self.series[order]
+
+    def merge(self, other):
+        """Add the totals of another recorder over the same approaches (vehicles on it count as done)"""
+        for i in range(len(self.approaches)):
+            other.delay[i].add_many(list(other.present[i].values()))
+            other.present[i].clear()
+            self.delay[i].merge(other.delay[i])
+            self.queue[i].merge(other.queue[i])
+        self.steps += other.steps
+
+    def stats(self):
+        """Per-approach stats dict; vehicles still on an approach count with their current time loss"""
+        stats = {}
+        for i, approach in enumerate(self.approaches):
+            delay = self.delay[i]
+            if self.present[i]:
+                delay = delay.copy().add_many(list(self.present[i].values()))
+            queue = self.queue[i]
+            stats[approach] = {
+                "mean_delay": delay.moments.mean,
+                "max_delay": max(delay.moments.max, 0),
+                "p95_delay": delay.percentile(95),
+                "throughput": 0,
+                "mean_queue": queue.moments.mean,
+                "max_queue": int(queue.moments.max) if queue.count else 0,
+                "p95_queue": queue.percentile(95)
+            }
+        return stats
+
+    def summary(self):
+        """Per-approach [count, mean, std] of vehicle delays and step queues, as race checkpoints keep them"""
+        summary = {}
+        for i, approach in enumerate(self.approaches):
+            delay = self.delay[i].moments
+            if self.present[i]:
+                delay = delay.copy().add_many(list(self.present[i].values()))
+            queue = self.queue[i].moments
+            summary[approach] = {"delay": [delay.count, delay.mean, delay.std],
+                                 "queue": [queue.count, queue.mean, queue.std]}
+        return summary
+
+    def cost(self):
+        """Selection cost so far: summed mean delay over approaches"""
+        return float(sum(s["mean_delay"] for s in self.stats().values()))
+
+
+def store_sink(store, run_id, generation, approaches):
+    """Sink writing recorder series into a RunStore's step_series table"""
+    def sink(steps, series):
+        for step, row in zip(steps, series):
+            for i, approach in enumerate(approaches):
+                store.log_step(run_id, generation, int(step), approach, *map(float, row[:, i]))
+    return sink
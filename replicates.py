@@ -0,0 +1,142 @@
+import numpy as np
+
+from online_stats import RunningStats
+from profiling import Profiler
+from sumo_eval import evaluate_candidates
+
+# Two-sided 95% Student t critical values by degrees of freedom; 1.96 beyond the table
+t_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def half_width(samples, axis=0):
+    """Half width of the 95% confidence interval of the mean of samples along axis"""
+    samples = np.asarray(samples, dtype=float)
+    n = samples.shape[axis]
+    if n < 2:
+        return np.full(np.delete(samples.shape, axis), np.inf)
+    t = t_95[n - 2] if n - 1 <= len(t_95) else 1.96
+    return t * samples.std(axis=axis, ddof=1) / np.sqrt(n)
+
+
+def pooled(parts):
+    """[count, mean, std] of the values behind several [count, mean, std] summaries taken together"""
+    total = RunningStats()
+    for n, mean, std in parts:
+        part = RunningStats()
+        part.count, part.mean, part.m2 = n, mean, std * std * max(n - 1, 0)
+        total.merge(part)
+    return [total.count, total.mean, total.std]
+
+
+def mean_checkpoint(checkpoints):
+    """One checkpoint of the replicates' runs: mean step and cost, pooled per-approach stats"""
+    steps, cost = np.mean([c[:2] for c in checkpoints], axis=0).tolist()
+    summary = {approach: {metric: pooled([c[2][approach][metric] for c in checkpoints])
+                          for metric in values}
+               for approach, values in checkpoints[0][2].items()}
+    return [steps, cost, summary]
+
+
+def mean_stats(replicates, order):
+    """Per-approach stats averaged over replicate runs, with 95% intervals of mean delay"""
+    stats = {}
+    for approach in order:
+        runs = [r[approach] for r in replicates]
+        stats[approach] = {key: float(np.mean([run[key] for run in runs])) for key in runs[0]}
+        delays = [run["mean_delay"] for run in runs]
+        h = float(half_width(delays))
+        stats[approach]["mean_delay_ci"] = (stats[approach]["mean_delay"] - h,
+                                            stats[approach]["mean_delay"] + h)
+    # Replicates share their checkpoint steps, so the mean run can serve as a race incumbent
+    checkpoints = [r["_run"].get("checkpoints") or [] for r in replicates]
+    if all(len(c) == len(checkpoints[0]) for c in checkpoints):
+        checkpoints = [mean_checkpoint(at) for at in zip(*checkpoints)]
+    else:
+        checkpoints = []
+    stats["_run"] = {"truncated": False, "replicates": len(replicates),
+                     "steps": sum(r["_run"]["steps"] for r in replicates), "checkpoints": checkpoints}
+    profiler = Profiler()
+    for r in replicates:
+        profiler.merge(r.get("_profile", {}))
+    stats["_profile"] = profiler.report()
+    return stats
+
+
+class ReplicateScheduler:
+    """Evaluate plans over common random numbers, adding replicates only where rankings are unsure
+
+    Every plan is first run under the same replicates seeds (sumo_config
+    seed, seed + 1, ...), so plans are compared on identical demand draws
+    and the differences between them are paired. A plan whose paired cost
+    difference to the current best still has a 95% interval that contains
+    zero gets one more common seed, together with the best plan, until the
+    decision is clear or max_replicates is reached. The cost of a run is the
+    summed mean delay over approaches, as in ApproachRecorder.cost().
+    """
+
+    def __init__(self, sumo_config, approaches, replicates=3, max_replicates=10,
+                 max_workers=None, cache=None):
+        self.sumo_config = sumo_config
+        self.approaches = approaches
+        self.order = list(approaches)
+        self.replicates = replicates
+        self.max_replicates = max(max_replicates, replicates)
+        self.max_workers = max_workers
+        self.cache = cache
+        self.runs = 0
+
+    def seed(self, r):
+        return (self.sumo_config.get("seed") or 0) + r
+
+    def _run(self, candidates, plans, r):
+        """Run replicate r of the given plan indices as one parallel batch"""
+        jobs = [candidates[i] for i in plans]
+        results = evaluate_candidates(jobs, self.sumo_config, self.approaches,
+                                      max_workers=self.max_workers, cache=self.cache,
+                                      seeds=[self.seed(r)] * len(jobs))
+        self.runs += len(jobs)
+        return results
+
+    def evaluate(self, candidates):
+        """Replicate-averaged stats per candidate (None when every replicate failed)"""
+        n = len(candidates)
+        runs = [[] for _ in range(n)]
+        costs = np.full((n, self.max_replicates), np.nan)
+
+        def record(plans, r):
+            for i, stats in zip(plans, self._run(candidates, plans, r)):
+                if stats is not None:
+                    runs[i].append(stats)
+                    costs[i, r] = sum(stats[a]["mean_delay"] for a in self.order)
+
+        for r in range(self.replicates):
+            record(range(n), r)
+
+        for r in range(self.replicates, self.max_replicates):
+            uncertain = self.uncertain(costs[:, :r])
+            if not uncertain:
+                break
+            record(uncertain, r)
+
+        return [mean_stats(plan_runs, self.order) if plan_runs else None for plan_runs in runs]
+
+    def uncertain(self, costs):
+        """Plans (best included) whose paired difference to the best is not yet significant"""
+        means = np.nanmean(np.where(np.isnan(costs).all(axis=1, keepdims=True), np.inf, costs), axis=1)
+        if not np.isfinite(means).any():
+            return []
+        best = int(np.argmin(means))
+        uncertain = []
+        for i in range(len(costs)):
+            if i == best or not np.isfinite(means[i]):
+                continue
+            # Only seeds both plans have run under are paired
+            paired = ~np.isnan(costs[i]) & ~np.isnan(costs[best])
+            diff = costs[i, paired] - costs[best, paired]
+            spread = half_width(diff)
+            # Identical outcomes on every seed are a tie, not an open question
+            if len(diff) < 2 or (spread > 0 and abs(diff.mean()) <= spread):
+                uncertain.append(i)
+        return uncertain + [best] if uncertain else []
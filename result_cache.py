@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from xml.etree import ElementTree as ET
+
+# Bumped whenever run_simulation() changes how its stats are computed
+stats_version = 6
+
+
+def file_digest(path, _memo={}):
+    """sha256 of a file, remembered per (path, size, mtime) so unchanged files are hashed once"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _memo[memo_key] = h.hexdigest()
+    return _memo[memo_key]
+
+
+def route_files(sumocfg):
+    """Route/trip files listed in a .sumocfg, resolved relative to it"""
+    root = ET.parse(sumocfg).getroot()
+    element = root.find("./input/route-files")
+    if element is None:
+        return []
+    base = os.path.dirname(sumocfg)
+    return [os.path.join(base, name.strip()) for name in element.get("value", "").split(",") if name.strip()]
+
+
+def config_key(sumo_config, approaches=None):
+    """Digest of everything a run's stats depend on apart from the plan
+
+    That is the demand, network, config, seed and start state, how the
+    splits are applied, the SUMO config profile, the series sampling and
+    the approaches the stats are split into.
+    """
+    parts = {
+        "sumocfg": file_digest(sumo_config["sumocfg"]),
+        "routes": [file_digest(path) for path in
+                   sumo_config.get("route_files") or route_files(sumo_config["sumocfg"])],
+        "net": file_digest(sumo_config["net_file"]),
+        "seed": sumo_config.get("seed"),
+        "steps": sumo_config["simulation_steps"],
+        "tls_mode": sumo_config.get("tls_mode", "runtime"),
+        "profile": sumo_config.get("sumocfg_profile", "full"),
+        "series": sumo_config.get("series_every") or 0,
+        "approaches": approaches,
+        "stats": stats_version
+    }
+    if sumo_config.get("begin"):
+        parts["begin"] = sumo_config["begin"]
+    if sumo_config.get("stepping", "step") != "step":
+        # Cycle-stepped runs measure delay and queues with detectors instead
+        parts["stepping"] = sumo_config["stepping"]
+    if sumo_config.get("fidelity", "micro") != "micro":
+        parts["fidelity"] = sumo_config["fidelity"]
+    if sumo_config.get("state_file"):
+        # Runs resumed from a saved warm-up depend on that state as well
+        parts["state"] = file_digest(sumo_config["state_file"])
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def run_key(strategies, sumo_config, config=None, approaches=None):
+    """Cache key of one run: its green times and config_key() (passed as config when already known)"""
+    parts = {"plan": sorted(strategies.items()), "config": config or config_key(sumo_config, approaches)}
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Persistent cache of run_simulation() stats with LRU eviction by count and size
+
+    Each row also keeps the config_key() it was simulated under, so rows of
+    one scenario can be read back with entries(config).
+    """
+
+    def __init__(self, path="result_cache.sqlite", max_entries=10000, max_bytes=64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, plan TEXT, stats TEXT, size INTEGER, last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        # Caches written before rows carried their config get the column, left empty
+        if "config" not in [row[1] for row in self.db.execute("PRAGMA table_info(results)")]:
+            self.db.execute("ALTER TABLE results ADD COLUMN config TEXT")
+        self.db.commit()
+
+    def get(self, key):
+        row = self.db.execute("SELECT stats FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, strategies, stats, config=None):
+        # numpy scalars are not JSON serialisable, plain floats are enough here
+        payload = json.dumps(stats, default=float)
+        self.db.execute(
+            "INSERT OR REPLACE INTO results (key, plan, stats, size, last_used, config) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, json.dumps(strategies), payload, len(payload), time.time(), config)
+        )
+        self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            key, entry_size = self.db.execute(
+                "SELECT key, size FROM results ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+
+    def entries(self, config=None):
+        """Cached (strategies, stats) pairs, only those simulated under config_key() config if given"""
+        if config is None:
+            rows = self.db.execute("SELECT plan, stats FROM results")
+        else:
+            rows = self.db.execute("SELECT plan, stats FROM results WHERE config = ?", (config,))
+        for plan, stats in rows:
+            yield json.loads(plan), json.loads(stats)
+
+    def close(self):
+        self.db.close()
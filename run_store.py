@@ -0,0 +1,208 @@
+import sys
+import csv
+import json
+import time
+import sqlite3
+
+# Per-approach columns of generation_stats; any other stats go to the extra JSON column
+stat_columns = ["green_time", "mean_delay", "max_delay", "throughput", "max_queue",
+                "mean_trip_delay", "payoff", "strategy_change"]
+step_columns = ["queue", "halting", "mean_time_loss"]
+
+
+def _value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class RunStore:
+    """One SQLite database holding every optimisation run
+
+    runs:             run id, script, start time and the run's config as JSON
+    generation_stats: one row per run, generation and approach
+    step_series:      optional per-step (or downsampled) approach time series
+                      of a run's generations
+    profiles:         per-generation wall time and calls of each profiled section
+    candidates:       cost of every candidate plan of a generation at each
+                      fidelity it was simulated at ("meso", "micro")
+
+    Rows are buffered and written in batches of batch_size; flush() (or
+    close()) writes the rest. Indexes on run, generation and approach keep
+    filtered queries fast across hundreds of runs.
+    """
+
+    def __init__(self, path="runs.sqlite", batch_size=500):
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(path)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY, script TEXT, started REAL, config TEXT);
+            CREATE TABLE IF NOT EXISTS generation_stats (
+                run_id INTEGER, generation INTEGER, approach TEXT,
+                {", ".join(f"{c} REAL" for c in stat_columns)}, extra TEXT);
+            CREATE INDEX IF NOT EXISTS generation_stats_run
+                ON generation_stats (run_id, generation);
+            CREATE INDEX IF NOT EXISTS generation_stats_approach
+                ON generation_stats (approach, run_id);
+            CREATE TABLE IF NOT EXISTS step_series (
+                run_id INTEGER, generation INTEGER, step INTEGER, approach TEXT,
+                {", ".join(f"{c} REAL" for c in step_columns)});
+            CREATE INDEX IF NOT EXISTS step_series_run
+                ON step_series (run_id, generation, approach, step);
+            CREATE TABLE IF NOT EXISTS profiles (
+                run_id INTEGER, generation INTEGER, section TEXT, seconds REAL, calls INTEGER);
+            CREATE INDEX IF NOT EXISTS profiles_run ON profiles (run_id, generation);
+            CREATE TABLE IF NOT EXISTS candidates (
+                run_id INTEGER, generation INTEGER, candidate INTEGER, fidelity TEXT,
+                cost REAL, plan TEXT);
+            CREATE INDEX IF NOT EXISTS candidates_run ON candidates (run_id, generation);
+        """)
+        self.pending = {"generation_stats": [], "step_series": [], "profiles": [], "candidates": []}
+
+    def start_run(self, script, config=None):
+        """Register a run and return its id"""
+        cursor = self.db.execute("INSERT INTO runs (script, started, config) VALUES (?, ?, ?)",
+                                 (script, time.time(), json.dumps(config or {}, default=str)))
+        self.db.commit()
+        return cursor.lastrowid
+
+    def log(self, run_id, generation, approach, stats):
+        """Buffer one approach's stats; keys outside stat_columns are kept as JSON"""
+        extra = {k: v for k, v in stats.items() if k not in stat_columns}
+        row = [run_id, generation, approach]
+        row += [None if stats.get(c) is None else float(stats[c]) for c in stat_columns]
+        row.append(json.dumps(extra, default=float) if extra else None)
+        self._buffer("generation_stats", row)
+
+    def log_step(self, run_id, generation, step, approach, queue, halting, mean_time_loss):
+        self._buffer("step_series", (run_id, generation, step, approach, queue, halting, mean_time_loss))
+
+    def log_profile(self, run_id, generation, report):
+        """Buffer a Profiler.report() of one generation"""
+        for section, (seconds, calls) in report.items():
+            self._buffer("profiles", (run_id, generation, section, seconds, calls))
+
+    def log_candidate(self, run_id, generation, candidate, fidelity, cost, plan):
+        """Buffer the cost of candidate number candidate of a generation at one fidelity"""
+        self._buffer("candidates", (run_id, generation, candidate, fidelity, float(cost),
+                                    json.dumps(plan, sort_keys=True, default=float)))
+
+    def _buffer(self, table, row):
+        self.pending[table].append(row)
+        if len(self.pending[table]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self.pending.items():
+            if rows:
+                marks = ", ".join("?" * len(rows[0]))
+                self.db.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+                rows.clear()
+        self.db.commit()
+
+    def discard_after(self, run_id, generation):
+        """Delete a run's rows of every generation after generation, such as an interrupted one's"""
+        self.flush()
+        for table in self.pending:
+            self.db.execute(f"DELETE FROM {table} WHERE run_id = ? AND generation > ?", (run_id, generation))
+        self.db.commit()
+
+    def runs(self, script=None):
+        """(run_id, script, started, config) of every run, oldest first"""
+        query = "SELECT run_id, script, started, config FROM runs"
+        rows = self.db.execute(query + " WHERE script = ?", (script,)) if script else self.db.execute(query)
+        return [(run_id, s, started, json.loads(config)) for run_id, s, started, config in rows]
+
+    def generations(self, run_ids=None, approach=None, script=None):
+        """generation_stats rows as dicts, filtered by run ids, approach and script"""
+        self.flush()
+        where, params = [], []
+        if run_ids is not None:
+            run_ids = list(run_ids)
+            where.append(f"g.run_id IN ({', '.join('?' * len(run_ids))})")
+            params += run_ids
+        if approach is not None:
+            where.append("g.approach = ?")
+            params.append(approach)
+        if script is not None:
+            where.append("r.script = ?")
+            params.append(script)
+        query = (f"SELECT g.run_id, g.generation, g.approach, {', '.join('g.' + c for c in stat_columns)}, "
+                 "g.extra FROM generation_stats g JOIN runs r USING (run_id)")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY g.run_id, g.generation"
+        names = ["run_id", "generation", "approach"] + stat_columns
+        rows = []
+        for row in self.db.execute(query, params):
+            record = dict(zip(names, row[:-1]))
+            record.update(json.loads(row[-1]) if row[-1] else {})
+            rows.append(record)
+        return rows
+
+    def steps(self, run_id, generation=None, approach=None):
+        """step_series rows of one run as dicts"""
+        self.flush()
+        query = (f"SELECT generation, step, approach, {', '.join(step_columns)} "
+                 "FROM step_series WHERE run_id = ?")
+        params = [run_id]
+        if generation is not None:
+            query += " AND generation = ?"
+            params.append(generation)
+        if approach is not None:
+            query += " AND approach = ?"
+            params.append(approach)
+        names = ["generation", "step", "approach"] + step_columns
+        query += " ORDER BY generation, step"
+        return [dict(zip(names, row)) for row in self.db.execute(query, params)]
+
+    def profiles(self, run_id):
+        """{generation: {section: [seconds, calls]}} of one run"""
+        self.flush()
+        profiles = {}
+        for generation, section, seconds, calls in self.db.execute(
+                "SELECT generation, section, seconds, calls FROM profiles WHERE run_id = ?", (run_id,)):
+            profiles.setdefault(generation, {})[section] = [seconds, calls]
+        return profiles
+
+    def candidates(self, run_id, generation=None):
+        """{(generation, candidate): {fidelity: cost}} of one run, to compare fidelities' rankings"""
+        self.flush()
+        query = "SELECT generation, candidate, fidelity, cost FROM candidates WHERE run_id = ?"
+        params = [run_id]
+        if generation is not None:
+            query += " AND generation = ?"
+            params.append(generation)
+        costs = {}
+        for gen, candidate, fidelity, cost in self.db.execute(query, params):
+            costs.setdefault((gen, candidate), {})[fidelity] = cost
+        return costs
+
+    def import_csv(self, path, script=None):
+        """Load an optimization_*_log_*.csv written by the earlier scripts as a new run"""
+        columns = {"GreenTime": "green_time", "MeanDelay": "mean_delay", "MaxDelay": "max_delay",
+                   "Throughput": "throughput", "MaxQueue": "max_queue",
+                   "MeanTripDelay": "mean_trip_delay", "Payoff": "payoff",
+                   "StrategyChange": "strategy_change"}
+        run_id = self.start_run(script or "csv", {"source": path})
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                stats = {columns.get(k, k): _value(v) for k, v in row.items()
+                         if k not in ("Generation", "Approach") and v not in ("", None)}
+                self.log(run_id, int(row["Generation"]), row["Approach"], stats)
+        self.flush()
+        return run_id
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+if __name__ == "__main__":
+    # python run_store.py runs.sqlite optimization_v3_log_*.csv
+    store = RunStore(sys.argv[1])
+    for path in sys.argv[2:]:
+        print(f"{path} -> run {store.import_csv(path)}")
+    store.close()
@@ -0,0 +1,132 @@
+import os
+import re
+
+from collectors import SubscriptionCollector
+from network_index import load_index, lane_approach
+from sumo_backend import start as start_sumo
+from recorder import ApproachRecorder
+from sumo_eval import run_dir, sumo_command
+from tls_control import start_cycle, CycleWatcher
+from trip_accounting import TripAccounting
+
+_tl_state = re.compile(r'(<tlLogic id="([^"]+)"[^>]*\bphase="(\d+)"[^>]*\bstate=")("/?>)')
+
+
+def repair_tls_state(path, index):
+    """Fill in the empty tlLogic state attributes of a saved state
+
+    SUMO 1.28 writes state="" for traffic lights whose programme was replaced
+    through TraCI and then refuses to load the file, so the state string of
+    the saved phase is taken from the network index.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    def fill(match):
+        phases = index["tl_logics"].get(match.group(2), {}).get("phases", ())
+        phase = int(match.group(3))
+        state = phases[phase]["state"] if phase < len(phases) else ""
+        return match.group(1) + state + match.group(4)
+
+    repaired = _tl_state.sub(fill, text)
+    if repaired != text:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(repaired)
+
+
+def save_state(conn, path, index):
+    conn.simulation.saveState(path)
+    repair_tls_state(path, index)
+
+
+def save_warmup(strategies, sumo_config, warmup_steps, path, label="warmup"):
+    """Run the first warmup_steps under strategies once and save the state to path"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = start_sumo(sumo_command(sumo_config), sumo_config.get("backend", "auto"), label)
+    try:
+        start_cycle(conn, strategies)
+        for _ in range(warmup_steps):
+            conn.simulationStep()
+        save_state(conn, path, load_index(sumo_config["net_file"]))
+    finally:
+        conn.close()
+    return path
+
+
+def _branch(conn, base, strategies, approaches, lane_map, max_steps):
+    """Load base, run strategies for one J0 cycle (at most max_steps)
+
+    Returns the cycle's ApproachRecorder and arrivals per approach.
+    """
+    if base is not None:
+        conn.simulation.loadState(base)
+    start_cycle(conn, strategies)
+    collect = SubscriptionCollector(conn, approaches, lane_map).collect
+    accounting = TripAccounting(conn, approaches)
+    recorder = ApproachRecorder(approaches)
+    watcher = CycleWatcher()
+    for _ in range(max_steps):
+        conn.simulationStep()
+        accounting.step()
+        recorder.add(collect())
+        if watcher.boundary(conn):
+            break
+    return recorder, {a: trips["throughput"] for a, trips in accounting.stats().items()}
+
+
+def run_branching(strategies, sumo_config, approaches, propose, label="branch"):
+    """Cycle-by-cycle control that tries several splits from the same saved state
+
+    At every J0 cycle boundary the state is saved and propose(cycle_stats,
+    strategies) returns the candidate splits for the next cycle. Each one is
+    run for a cycle from the saved state and the one with the lowest
+    ApproachRecorder.cost() is kept: the simulation continues from its end state.
+    Starts from sumo_config["state_file"] when set. Returns the stats of the
+    kept cycles and the list of (time, strategies, cost) choices made.
+    """
+    directory = os.path.join(run_dir, label)
+    os.makedirs(directory, exist_ok=True)
+    index = load_index(sumo_config["net_file"])
+    lane_map = lane_approach(index, approaches)
+    end = sumo_config["simulation_steps"]
+
+    conn = start_sumo(sumo_command(sumo_config), sumo_config.get("backend", "auto"), label)
+    try:
+        base = sumo_config.get("state_file")
+        recorder, arrived = _branch(conn, base, strategies, approaches, lane_map, end)
+        choices = [(conn.simulation.getTime(), dict(strategies), recorder.cost())]
+        totals = ApproachRecorder(approaches)
+        throughput = dict.fromkeys(approaches, 0)
+        base = os.path.join(directory, "base.xml")
+        save_state(conn, base, index)
+
+        while True:
+            cycle_stats = recorder.stats()
+            for approach in approaches:
+                cycle_stats[approach]["throughput"] = arrived[approach]
+                throughput[approach] += arrived[approach]
+            totals.merge(recorder)
+            if conn.simulation.getTime() >= end:
+                break
+
+            candidates = propose(cycle_stats, dict(strategies)) or [strategies]
+            remaining = end - int(conn.simulation.getTime())
+            best = None
+            for candidate in candidates:
+                outcome = _branch(conn, base, candidate, approaches, lane_map, remaining)
+                cost = outcome[0].cost()
+                if best is None or cost < best[0]:
+                    best = (cost, candidate, outcome)
+                    save_state(conn, os.path.join(directory, "best.xml"), index)
+
+            cost, strategies, (recorder, arrived) = best
+            os.replace(os.path.join(directory, "best.xml"), base)
+            conn.simulation.loadState(base)
+            choices.append((conn.simulation.getTime(), dict(strategies), cost))
+    finally:
+        conn.close()
+
+    stats = totals.stats()
+    for approach in approaches:
+        stats[approach]["throughput"] = throughput[approach]
+    return stats, choices
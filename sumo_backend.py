@@ -0,0 +1,44 @@
+import socket
+import importlib
+
+backends = ["auto", "libsumo", "traci"]
+
+
+def find_free_port():
+    """Ask the OS for an unused TCP port for a worker's TraCI connection"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def get_backend(name="auto"):
+    """The libsumo or traci module; "auto" prefers in-process libsumo when it is installed"""
+    if name not in backends:
+        raise ValueError(f"Unknown SUMO backend {name!r}, expected one of {backends}")
+    if name in ("auto", "libsumo"):
+        try:
+            return importlib.import_module("libsumo")
+        except ImportError:
+            if name == "libsumo":
+                raise
+    return importlib.import_module("traci")
+
+
+def start(cmd, backend="auto", label="default"):
+    """Start SUMO on the chosen backend and return an object with the TraCI API
+
+    libsumo runs the simulation inside this process (one per process, no
+    port or label, cmd[0] is ignored); traci launches cmd as a subprocess
+    on its own port under a labelled connection.
+    """
+    module = get_backend(backend)
+    if module.__name__ == "libsumo":
+        module.start(cmd)
+        return module
+    module.start(cmd, port=find_free_port(), label=label)
+    return module.getConnection(label)
+
+
+def traci_errors(conn):
+    """Exception type raised for failed commands on conn"""
+    return getattr(conn, "TraCIException", None) or importlib.import_module("traci").TraCIException
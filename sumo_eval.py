@@ -0,0 +1,613 @@
+import os
+import gzip
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree as ET
+
+import numpy as np
+
+from collectors import SubscriptionCollector
+from detectors import write_detectors, DetectorReader, CycleTotals
+from network_index import load_index, lane_approach
+from profiling import Profiler, CountingConnection
+from result_cache import config_key, file_digest, run_key
+from sumo_backend import start as start_sumo, traci_errors
+from recorder import ApproachRecorder
+from trip_accounting import TripAccounting
+from tls_control import green_phases, start_cycle, CycleWatcher, CycleClock
+from tripinfo_stream import aggregate_tripinfo
+
+# Every worker writes its network and tripinfo under runs/<label>/
+run_dir = "runs"
+# Rows of per-step series a run keeps in memory
+series_capacity = 4096
+# Steps between the running costs every full run records, so any of them can be a race incumbent
+checkpoint_interval = 120
+# Standard errors a racing candidate must trail the incumbent by, on top of race_margin
+race_z = 1.96
+# Options the lean evaluation profile drops from the .sumocfg, and those it sets
+lean_drop = ["output", "gui_only", "verbose", "duration-log.statistics"]
+lean_report = {"no-warnings": "true", "no-step-log": "true"}
+# Mesoscopic screening runs; the TLS flow penalty reads the splits from the network file
+# Signalised edges are slowed in proportion to their red time; --meso-junction-control
+# ranked candidates worse against micro trip delay, alone or on top of the penalty
+meso_options = ["--mesosim", "--meso-tls-flow-penalty", "1"]
+
+
+def worker_paths(label):
+    """Per-worker output paths so parallel runs never share files"""
+    directory = os.path.join(run_dir, label)
+    os.makedirs(directory, exist_ok=True)
+    return {
+        "net_file": os.path.join(directory, "osm_updated.net.xml.gz"),
+        "tripinfo": os.path.join(directory, "tripinfo.xml"),
+        "detectors": os.path.join(directory, "detectors.add.xml")
+    }
+
+
+def remove_worker_dirs(labels):
+    """Delete the worker_paths() directories of finished runs"""
+    for label in labels:
+        shutil.rmtree(os.path.join(run_dir, label), ignore_errors=True)
+
+
+def write_net_file(strategies, net_file, out_file):
+    """Write a copy of net_file with the J0 green durations set from strategies"""
+    with gzip.open(net_file, "rt", encoding="utf-8") as f:
+        tree = ET.parse(f)
+        root = tree.getroot()
+
+    for tl_logic in root.findall(".//tlLogic"):
+        if tl_logic.get("id") == "J0":
+            phases = tl_logic.findall("phase")
+            for approach, index in green_phases.items():
+                phases[index].set("duration", str(strategies[approach]))
+
+    with gzip.open(out_file, "wb") as f:
+        tree.write(f, encoding="utf-8", xml_declaration=True)
+
+
+def get_approach_metrics(conn, lane_map, approaches):
+    """Collect metrics by polling every vehicle; lane_map is the index's lane -> approach
+
+    Per approach: time loss of each vehicle on it, halting vehicles summed
+    over its lanes and the longest lane queue.
+    """
+    metrics = {approach: {
+        "vehicles": {},
+        "halting": 0,
+        "max_queue": 0
+    } for approach in approaches}
+
+    errors = traci_errors(conn)
+
+    # Vehicle data collection
+    for veh_id in conn.vehicle.getIDList():
+        try:
+            approach = lane_map.get(conn.vehicle.getLaneID(veh_id))
+            if approach:
+                metrics[approach]["vehicles"][veh_id] = conn.vehicle.getTimeLoss(veh_id)
+        except errors:
+            continue
+
+    # Queue length calculation
+    for lane, approach in lane_map.items():
+        try:
+            queue = conn.lane.getLastStepHaltingNumber(lane)
+            metrics[approach]["halting"] += queue
+            metrics[approach]["max_queue"] = max(metrics[approach]["max_queue"], queue)
+        except errors:
+            continue
+
+    return metrics
+
+
+def incumbent_at(checkpoints, steps):
+    """Per-approach running stats of an incumbent after steps (see ApproachRecorder.summary())
+
+    Counts, means and standard deviations are interpolated between its
+    checkpoints; None outside them or for checkpoints without the stats.
+    """
+    if not checkpoints or len(checkpoints[0]) < 3 or not checkpoints[0][0] <= steps <= checkpoints[-1][0]:
+        return None
+    at = [c[0] for c in checkpoints]
+    return {
+        approach: {
+            metric: [float(np.interp(steps, at, [c[2][approach][metric][k] for c in checkpoints]))
+                     for k in range(3)]
+            for metric in values
+        }
+        for approach, values in checkpoints[0][2].items()
+    }
+
+
+def dominated(summary, incumbent, margin, z=race_z):
+    """True when a candidate's running stats are worse than the incumbent's beyond chance and the margin
+
+    Both are {approach: {"delay": [count, mean, std], "queue": [...]}}. The
+    candidate's summed mean delay must exceed the incumbent's by margin
+    (relative) plus z standard errors of the difference, and no approach may
+    be better by more than z standard errors on either its delay or its
+    queue. Neither side decides anything before each approach has two delay
+    samples. Successive delays and queues are correlated, so the standard
+    errors are optimistic; the margin covers that on the total, and on the
+    approaches it only makes the candidate harder to stop.
+    """
+    if incumbent is None or summary.keys() != incumbent.keys():
+        return False
+    if any(side[a]["delay"][0] < 2 for side in (summary, incumbent) for a in summary):
+        return False
+
+    def variance(n, mean, std):
+        return std * std / n if n else 0.0
+
+    gap = sum(summary[a]["delay"][1] - incumbent[a]["delay"][1] for a in summary)
+    se = sum(variance(*summary[a]["delay"]) + variance(*incumbent[a]["delay"]) for a in summary) ** 0.5
+    if gap <= margin * sum(incumbent[a]["delay"][1] for a in summary) + z * se:
+        return False
+    for approach, metrics in summary.items():
+        for metric, (n, mean, std) in metrics.items():
+            other = incumbent[approach][metric]
+            if mean + z * (variance(n, mean, std) + variance(*other)) ** 0.5 < other[1]:
+                return False
+    return True
+
+
+def _checkpoint(steps, race_interval):
+    """Whether steps is a recorded checkpoint, and whether it is a race checkpoint"""
+    race = bool(race_interval) and steps % race_interval == 0
+    return race or steps % checkpoint_interval == 0, race
+
+
+def _decorative(path):
+    """True for an additional file holding only polygons and POIs"""
+    with gzip.open(path) if path.endswith(".gz") else open(path, "rb") as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag not in ("poly", "poi", "location", "param", "additional"):
+                return False
+            elem.clear()
+    return True
+
+
+def evaluation_sumocfg(sumocfg, _memo={}):
+    """Lean copy of sumocfg for optimizer runs, written next to it when missing or stale
+
+    Polygon files, file outputs, GUI settings and verbose reporting are left
+    out, as none of them feeds the fitness; warnings and the step log are
+    switched off. Other additional files (detectors, programs) are kept.
+    The copy is remembered per file_digest() of sumocfg.
+    """
+    memo_key = (os.path.abspath(sumocfg), file_digest(sumocfg))
+    if memo_key in _memo and os.path.exists(_memo[memo_key]):
+        return _memo[memo_key]
+    root = ET.parse(sumocfg).getroot()
+    base = os.path.dirname(sumocfg)
+    lean = ET.Element(root.tag)
+    for section in root:
+        if not isinstance(section.tag, str) or section.tag in lean_drop:
+            continue
+        copy = ET.SubElement(lean, section.tag)
+        for option in section:
+            if not isinstance(option.tag, str) or option.tag in lean_drop:
+                continue
+            if option.tag == "additional-files":
+                files = [f for f in option.get("value", "").split(",")
+                         if f and not _decorative(os.path.join(base, f))]
+                if not files:
+                    continue
+                option = ET.Element(option.tag, value=",".join(files))
+            copy.append(option)
+    report = lean.find("report")
+    if report is None:
+        report = ET.SubElement(lean, "report")
+    for name, value in lean_report.items():
+        for option in report.findall(name):
+            report.remove(option)
+        ET.SubElement(report, name, value=value)
+    ET.indent(lean)
+    text = ET.tostring(lean, encoding="unicode") + "\n"
+
+    path = os.path.splitext(sumocfg)[0] + ".eval.sumocfg"
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            current = f.read() == text
+    else:
+        current = False
+    if not current:
+        # Parallel workers may all get here; each replaces the file atomically
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    _memo[memo_key] = path
+    return path
+
+
+def sumo_command(sumo_config, net_file=None, tripinfo="NUL"):
+    """Command line for one run of sumo_config; SUMO discards output written to NUL
+
+    sumo_config["sumocfg_profile"] == "lean" runs the evaluation_sumocfg()
+    copy of the .sumocfg, or sumo_config["lean_sumocfg"] when the caller has
+    already built it; "full" (the default) keeps all of its reporting.
+    """
+    sumocfg = sumo_config["sumocfg"]
+    if sumo_config.get("sumocfg_profile", "full") == "lean":
+        sumocfg = sumo_config.get("lean_sumocfg") or evaluation_sumocfg(sumocfg)
+    cmd = [
+        sumo_config["sumo_bin"],
+        "-c", sumocfg,
+        "--net-file", net_file or sumo_config["net_file"],
+        "--tripinfo-output", tripinfo
+    ]
+    if sumo_config.get("seed") is not None:
+        cmd += ["--seed", str(sumo_config["seed"])]
+    # Scenario overrides of the demand and start time in the .sumocfg
+    if sumo_config.get("route_files"):
+        cmd += ["--route-files", ",".join(sumo_config["route_files"])]
+    if sumo_config.get("begin"):
+        cmd += ["--begin", str(sumo_config["begin"])]
+    return cmd
+
+
+def run_simulation(strategies, sumo_config, approaches, label="default", on_cycle=None,
+                   incumbent=None):
+    """Run one SUMO simulation of strategies on its own labelled connection
+
+    sumo_config["backend"] picks in-process libsumo or socket traci ("auto"
+    prefers libsumo when it is installed).
+
+    With sumo_config["tls_mode"] == "runtime" (the default) the green splits are
+    pushed through TraCI and the original network is loaded as-is; "netfile"
+    writes a per-worker copy of the network instead. on_cycle, if given, is
+    called at every J0 cycle boundary with that cycle's stats and may return a
+    new strategies dict to run for the next cycle (runtime mode only).
+    sumo_config["collector"] selects batched "subscription" metrics (default)
+    or the per-vehicle "polling" of get_approach_metrics(). Throughput and
+    trip delay are accounted live, so tripinfo is only written when
+    sumo_config["tripinfo"] is set.
+
+    The running cost and per-approach stats are recorded every
+    checkpoint_interval steps, and every sumo_config["race_interval"] steps
+    if set, in stats["_run"]["checkpoints"]. Given the checkpoints of an
+    incumbent run, a racing run stops early at the first race checkpoint
+    where it is worse than the incumbent by more than
+    sumo_config["race_margin"] and chance (see dominated()), and
+    stats["_run"]["truncated"] is set.
+
+    Approach metrics are kept by an ApproachRecorder, which counts each
+    vehicle's time loss once. With sumo_config["series_every"] set, every
+    that many steps of its per-step series are returned in stats["_series"]
+    (the last series_capacity rows).
+
+    stats["_profile"] holds the wall time and call count of each part of the
+    run (start, setup, step, accounting, collect, ...); with
+    sumo_config["profile"] set, the "traci" entry counts the TraCI commands
+    sent, at some cost in speed.
+
+    With sumo_config["state_file"] set, the run resumes from that saved
+    state (see snapshots.save_warmup) and only simulates the steps left until
+    sumo_config["simulation_steps"].
+    sumo_config["begin"] and sumo_config["route_files"] override the start
+    time and demand of the .sumocfg; simulation_steps stays the end time.
+
+    sumo_config["stepping"] == "cycle" hands the run to run_cycles(), and
+    sumo_config["fidelity"] == "meso" to run_meso().
+    """
+    if sumo_config.get("fidelity", "micro") == "meso":
+        return run_meso(strategies, sumo_config, approaches, label)
+    if sumo_config.get("stepping", "step") == "cycle":
+        return run_cycles(strategies, sumo_config, approaches, label, on_cycle, incumbent)
+    profiler = Profiler()
+    paths = worker_paths(label)
+    tls_mode = sumo_config.get("tls_mode", "runtime")
+    if tls_mode == "netfile":
+        with profiler.section("net_file"):
+            write_net_file(strategies, sumo_config["net_file"], paths["net_file"])
+        net_file = paths["net_file"]
+    else:
+        net_file = sumo_config["net_file"]
+
+    cmd = sumo_command(sumo_config, net_file,
+                       paths["tripinfo"] if sumo_config.get("tripinfo") else "NUL")
+    with profiler.section("start"):
+        conn = start_sumo(cmd, sumo_config.get("backend", "auto"), label)
+    if sumo_config.get("profile"):
+        conn = CountingConnection(conn)
+
+    try:
+        with profiler.section("setup"):
+            # Subscriptions do not survive loadState, so restore before subscribing
+            if sumo_config.get("state_file"):
+                conn.simulation.loadState(sumo_config["state_file"])
+            if tls_mode != "netfile":
+                start_cycle(conn, strategies)
+
+            # Approach lanes come from the precomputed network index
+            lane_map = lane_approach(load_index(sumo_config["net_file"]), approaches)
+            if sumo_config.get("collector", "subscription") == "subscription":
+                collect = SubscriptionCollector(conn, approaches, lane_map).collect
+            else:
+                collect = lambda: get_approach_metrics(conn, lane_map, approaches)
+
+            accounting = TripAccounting(conn, approaches)
+
+        every = sumo_config.get("series_every") or 0
+        recorder = ApproachRecorder(approaches, series_capacity if every else 0, every)
+        cycle_recorder = ApproachRecorder(approaches)
+        cycle_arrivals = {approach: 0 for approach in approaches}
+        watcher = CycleWatcher()
+
+        race_interval = sumo_config.get("race_interval")
+        checkpoints = []
+        truncated = False
+        steps = 0
+
+        simulation_step = profiler.timed("step", conn.simulationStep)
+        accounting_step = profiler.timed("accounting", accounting.step)
+        collect = profiler.timed("collect", collect)
+        record = profiler.timed("record", recorder.add)
+
+        remaining = sumo_config["simulation_steps"] - int(conn.simulation.getTime())
+        for _ in range(max(remaining, 0)):
+            simulation_step()
+            steps += 1
+            accounting_step()
+            current_metrics = collect()
+            record(current_metrics, steps)
+
+            if on_cycle is not None:
+                cycle_recorder.add(current_metrics)
+                if watcher.boundary(conn):
+                    cycle_stats = cycle_recorder.stats()
+                    trips = accounting.stats()
+                    for approach in approaches:
+                        arrived = trips[approach]["throughput"]
+                        cycle_stats[approach]["throughput"] = arrived - cycle_arrivals[approach]
+                        cycle_arrivals[approach] = arrived
+                    new_strategies = on_cycle(cycle_stats)
+                    if new_strategies:
+                        with profiler.section("tls"):
+                            start_cycle(conn, new_strategies)
+                    cycle_recorder = ApproachRecorder(approaches)
+
+            record_cost, race = _checkpoint(steps, race_interval)
+            if record_cost:
+                summary = recorder.summary()
+                checkpoints.append([steps, recorder.cost(), summary])
+                if race and dominated(summary, incumbent_at(incumbent, steps),
+                                      sumo_config.get("race_margin", 0.1)):
+                    truncated = True
+                    break
+    finally:
+        with profiler.section("close"):
+            conn.close()
+
+    stats = recorder.stats()
+    for approach, trips in accounting.stats().items():
+        stats[approach].update(trips)
+    stats["_run"] = {"truncated": truncated, "steps": steps, "checkpoints": checkpoints}
+    stats["_profile"] = profiler.report()
+    if isinstance(conn, CountingConnection):
+        stats["_profile"]["traci"] = [0.0, conn.total()]
+    if every:
+        series_steps, series = recorder.series_data()
+        stats["_series"] = {"step": series_steps.tolist(), "values": series.tolist()}
+    return stats
+
+
+def run_cycles(strategies, sumo_config, approaches, label="default", on_cycle=None, incumbent=None):
+    """run_simulation() advancing straight from one J0 cycle boundary to the next
+
+    Approach metrics come from lane-area detectors generated on the approach
+    lanes (detectors.write_detectors()), read once per advance, and the
+    cycle boundaries are computed from the splits (tls_control.CycleClock),
+    so a run costs a few TraCI calls per cycle instead of several per step.
+    Each approach's green start and the race checkpoints also end an
+    advance. Throughput and trip delay come from the run's tripinfo, which
+    is always written. Delays are the detectors' time loss on the approach
+    lanes, and queues are sampled as each approach turns green (see
+    detectors.CycleTotals); the stats keys are those of run_simulation().
+    Needs tls_mode "runtime".
+    """
+    if sumo_config.get("tls_mode", "runtime") != "runtime":
+        raise ValueError("Cycle stepping needs tls_mode 'runtime'")
+    profiler = Profiler()
+    paths = worker_paths(label)
+    index = load_index(sumo_config["net_file"])
+    lane_map = lane_approach(index, approaches)
+    end = sumo_config["simulation_steps"]
+    with profiler.section("detectors"):
+        write_detectors(sumo_config["net_file"], approaches, paths["detectors"], end + 1)
+
+    cmd = sumo_command(sumo_config, sumo_config["net_file"], paths["tripinfo"])
+    cmd += ["--additional-files", paths["detectors"]]
+    with profiler.section("start"):
+        conn = start_sumo(cmd, sumo_config.get("backend", "auto"), label)
+    if sumo_config.get("profile"):
+        conn = CountingConnection(conn)
+
+    try:
+        with profiler.section("setup"):
+            if sumo_config.get("state_file"):
+                conn.simulation.loadState(sumo_config["state_file"])
+            start_cycle(conn, strategies)
+            reader = DetectorReader(conn, approaches, lane_map)
+            clock = CycleClock(index["tl_logics"]["J0"]["phases"])
+            plan = dict(strategies)
+            start = now = conn.simulation.getTime()
+            boundary = clock.next_boundary(conn, plan)
+            # Green starts of the cycle in progress that are still ahead
+            greens = sorted((t, a) for a, t in clock.green_starts(boundary - clock.cycle_length(plan), plan).items()
+                            if t > now)
+
+        totals = CycleTotals(approaches)
+        race_interval = sumo_config.get("race_interval")
+        checkpoints = []
+        truncated = False
+        cycles = 0
+        current = None
+
+        simulation_step = profiler.timed("step", conn.simulationStep)
+        read = profiler.timed("collect", reader.read)
+        while now < end:
+            target = min(boundary, end)
+            if greens:
+                target = min(target, greens[0][0])
+            steps = int(now - start)
+            target = min(target, start + min((steps // interval + 1) * interval
+                                             for interval in (checkpoint_interval, race_interval) if interval))
+            simulation_step(float(target))
+            now = target
+            current = read()
+
+            if now >= boundary:
+                cycles += 1
+                span = totals.add(current)
+                new_strategies = on_cycle(span) if on_cycle is not None else None
+                if new_strategies:
+                    with profiler.section("tls"):
+                        start_cycle(conn, new_strategies)
+                    plan = dict(new_strategies)
+                greens = sorted((t, a) for a, t in clock.green_starts(now, plan).items())
+                boundary = now + clock.cycle_length(plan)
+            while greens and greens[0][0] <= now:
+                totals.sample_queue(greens.pop(0)[1], current)
+
+            steps = int(now - start)
+            record_cost, race = _checkpoint(steps, race_interval)
+            if record_cost:
+                summary = totals.summary(current)
+                checkpoints.append([steps, totals.cost(current), summary])
+                if race and dominated(summary, incumbent_at(incumbent, steps),
+                                      sumo_config.get("race_margin", 0.1)):
+                    truncated = True
+                    break
+    finally:
+        with profiler.section("close"):
+            conn.close()
+
+    stats = totals.stats(current)
+    with profiler.section("tripinfo"):
+        trips = aggregate_tripinfo(paths["tripinfo"], approaches)
+    for approach, data in trips.items():
+        stats[approach].update(throughput=data["count"], mean_trip_delay=data["mean"],
+                               max_trip_delay=data["max"])
+    stats["_run"] = {"truncated": truncated, "steps": int(now - start), "checkpoints": checkpoints,
+                     "cycles": cycles}
+    stats["_profile"] = profiler.report()
+    if isinstance(conn, CountingConnection):
+        stats["_profile"]["traci"] = [0.0, conn.total()]
+    return stats
+
+
+def run_meso(strategies, sumo_config, approaches, label="default"):
+    """Cheap mesoscopic screening run of strategies, with stats laid out as run_simulation()'s
+
+    SUMO runs on its own, without TraCI, on a per-worker network carrying the
+    splits (meso_options). The delay of an approach is the mean trip time
+    loss of the vehicles departing from it, read from the run's tripinfo,
+    as the approach lanes have no per-vehicle time loss in meso. Saved
+    micro states cannot be loaded, so the run always starts from the
+    beginning.
+    """
+    profiler = Profiler()
+    paths = worker_paths(label)
+    with profiler.section("net_file"):
+        write_net_file(strategies, sumo_config["net_file"], paths["net_file"])
+    config = {k: v for k, v in sumo_config.items() if k != "state_file"}
+    cmd = sumo_command(config, paths["net_file"], paths["tripinfo"]) + meso_options
+    cmd += ["--end", str(sumo_config["simulation_steps"])]
+    with profiler.section("sim"):
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    with profiler.section("tripinfo"):
+        trips = aggregate_tripinfo(paths["tripinfo"], approaches)
+
+    stats = {}
+    for approach, data in trips.items():
+        stats[approach] = {
+            "mean_delay": data["mean"],
+            "max_delay": data["max"],
+            "p95_delay": data["p95"],
+            "throughput": data["count"],
+            "mean_queue": 0,
+            "max_queue": 0,
+            "p95_queue": 0,
+            "mean_trip_delay": data["mean"],
+            "max_trip_delay": data["max"]
+        }
+    stats["_run"] = {"truncated": False, "steps": sumo_config["simulation_steps"], "checkpoints": [],
+                     "fidelity": "meso"}
+    stats["_profile"] = profiler.report()
+    return stats
+
+
+def _evaluate(strategies, sumo_config, approaches, label, incumbent=None):
+    """Pool entry point that reports a failed run as None instead of raising"""
+    try:
+        return run_simulation(strategies, sumo_config, approaches, label=label,
+                              incumbent=incumbent)
+    except Exception as e:
+        print(f"Error in {label} for {strategies}: {str(e)}")
+        return None
+
+
+def evaluate_candidates(candidates, sumo_config, approaches, max_workers=None, cache=None,
+                        incumbent=None, seeds=None):
+    """Evaluate a list of strategies dicts in parallel, returning stats in the same order
+
+    A failed run yields None in place of its stats. With a ResultCache, plans
+    already simulated under the same demand, network and seed are answered
+    from the cache, and duplicate plans in one call are simulated once.
+    incumbent is the checkpoint list of the best full run so far, used to stop
+    dominated candidates early (see run_simulation()); truncated runs are
+    never cached. seeds, if given, holds one SUMO seed per candidate in place
+    of sumo_config["seed"].
+    """
+    if seeds is None:
+        configs = [sumo_config] * len(candidates)
+    else:
+        configs = [dict(sumo_config, seed=seed) for seed in seeds]
+    if cache is None:
+        keys = [str(i) for i in range(len(candidates))]
+        digests = [None] * len(candidates)
+    else:
+        digests = [config_key(config, approaches) for config in configs]
+        keys = [run_key(c, config, digest) for c, config, digest in zip(candidates, configs, digests)]
+
+    results = {}
+    pending = {}
+    key_config = {}
+    for key, candidate, config, digest in zip(keys, candidates, configs, digests):
+        if key in results or key in pending:
+            continue
+        stats = cache.get(key) if cache is not None else None
+        if stats is not None:
+            results[key] = stats
+        else:
+            pending[key] = (candidate, config)
+            key_config[key] = digest
+
+    jobs = list(pending.items())
+    # Slot labels keep connections and output directories apart between the runs of one call,
+    # the caller's pid between concurrent optimisations; nothing in them outlives the call
+    labels = [f"worker{i}_{os.getpid()}" for i in range(len(jobs))]
+    try:
+        if max_workers == 1 or len(jobs) <= 1:
+            outcomes = [_evaluate(c, config, approaches, label, incumbent)
+                        for label, (_, (c, config)) in zip(labels, jobs)]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_evaluate, c, config, approaches, label, incumbent)
+                           for label, (_, (c, config)) in zip(labels, jobs)]
+                outcomes = [f.result() for f in futures]
+    finally:
+        remove_worker_dirs(labels)
+
+    for (key, (candidate, _)), stats in zip(jobs, outcomes):
+        results[key] = stats
+        if cache is not None and stats is not None and not stats["_run"]["truncated"]:
+            # Timings describe this run only, not the cached answer
+            cache.put(key, candidate, {k: v for k, v in stats.items() if k != "_profile"}, key_config[key])
+
+    return [results[key] for key in keys]
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class GaussianProcess:
+    """Exact GP regression with an RBF kernel on inputs scaled to [0, 1]
+
+    All outputs share one kernel; its length scale is picked from
+    lengthscales by the summed log marginal likelihood each time the model
+    is fitted. Outputs are standardised per column.
+    """
+
+    def __init__(self, lengthscales=(0.05, 0.1, 0.2, 0.4, 0.8), noise=0.05):
+        self.lengthscales = lengthscales
+        self.noise = noise
+
+    def kernel(self, a, b, lengthscale):
+        sq = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-0.5 * sq / lengthscale ** 2)
+
+    def fit(self, X, Y):
+        self.X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        self.y_mean = Y.mean(axis=0)
+        self.y_std = np.where(Y.std(axis=0) > 1e-9, Y.std(axis=0), 1.0)
+        Z = (Y - self.y_mean) / self.y_std
+
+        best = None
+        for lengthscale in self.lengthscales:
+            K = self.kernel(self.X, self.X, lengthscale) + self.noise * np.eye(len(self.X))
+            L = np.linalg.cholesky(K)
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, Z))
+            evidence = -0.5 * (Z * alpha).sum() - Z.shape[1] * np.log(np.diag(L)).sum()
+            if best is None or evidence > best[0]:
+                best = (evidence, lengthscale, L, alpha)
+        _, self.lengthscale, self.L, self.alpha = best
+        return self
+
+    def predict(self, X):
+        """Predicted mean (N x outputs) and standard deviation (N x outputs)"""
+        X = np.asarray(X, dtype=float)
+        Ks = self.kernel(X, self.X, self.lengthscale)
+        mean = Ks @ self.alpha
+        v = np.linalg.solve(self.L, Ks.T)
+        var = np.maximum(1 + self.noise - (v ** 2).sum(axis=0), 1e-12)
+        return mean * self.y_std + self.y_mean, np.sqrt(var)[:, None] * self.y_std
+
+
+class Surrogate:
+    """Predicts per-approach mean delay and max queue of a split from past runs
+
+    Samples come from earlier runs in the run store, the result cache and
+    the runs of the current optimisation. screen() ranks untried plans by a
+    lower confidence bound on the summed mean delay (the selection cost used
+    by the optimizer), so uncertain regions still get explored.
+    """
+
+    def __init__(self, order, min_phases=10, max_phases=60, kappa=1.0, max_samples=500):
+        self.order = list(order)
+        self.min_phases = min_phases
+        self.max_phases = max_phases
+        self.kappa = kappa
+        self.max_samples = max_samples
+        self.samples = {}
+        self.model = None
+
+    def add(self, plan, delays, queues):
+        """Record one run; repeated plans keep the mean of their outcomes"""
+        key = tuple(float(plan[a]) for a in self.order)
+        target = np.array([delays[a] for a in self.order] + [queues[a] for a in self.order], dtype=float)
+        total, count = self.samples.get(key, (0, 0))
+        self.samples[key] = (total + target, count + 1)
+        self.model = None
+
+    def add_stats(self, plan, stats):
+        self.add(plan, {a: stats[a]["mean_delay"] for a in self.order},
+                 {a: stats[a]["max_queue"] for a in self.order})
+
+    def load_store(self, store, run_ids):
+        """Samples from every generation of the given runs in a RunStore"""
+        plans = {}
+        for row in store.generations(run_ids):
+            plans.setdefault((row["run_id"], row["generation"]), {})[row["approach"]] = row
+        for generation in plans.values():
+            if set(self.order) <= set(generation):
+                self.add({a: generation[a]["green_time"] for a in self.order},
+                         {a: generation[a]["mean_delay"] for a in self.order},
+                         {a: generation[a]["max_queue"] for a in self.order})
+
+    def load_cache(self, cache, config):
+        """Samples from the ResultCache rows simulated under config (result_cache.config_key())"""
+        for plan, stats in cache.entries(config):
+            if set(self.order) <= set(plan) and not stats.get("_run", {}).get("truncated"):
+                self.add_stats(plan, stats)
+
+    def scale(self, plans):
+        return (np.asarray(plans, dtype=float) - self.min_phases) / (self.max_phases - self.min_phases)
+
+    def fit(self):
+        keys = list(self.samples)[-self.max_samples:]
+        X = self.scale(keys)
+        Y = np.array([self.samples[k][0] / self.samples[k][1] for k in keys])
+        self.model = GaussianProcess().fit(X, Y)
+        return self
+
+    def predict_cost(self, plans):
+        """Predicted summed mean delay of each plan and its standard deviation"""
+        if self.model is None:
+            self.fit()
+        mean, std = self.model.predict(self.scale(plans))
+        a = len(self.order)
+        # Delays are treated as independent when summing their uncertainty
+        return mean[:, :a].sum(axis=1), np.sqrt((std[:, :a] ** 2).sum(axis=1))
+
+    def screen(self, plans, keep):
+        """Indices of the keep plans with the lowest lower confidence bound on cost"""
+        mean, std = self.predict_cost(plans)
+        return np.argsort(mean - self.kappa * std, kind="stable")[:keep]
+
+
+def prescreen(population, surrogate, factor, rate=0.5):
+    """Replace the population's offspring by the most promising of factor times as many mutants
+
+    The first plan (the elite) is kept as it is. Does nothing until the
+    surrogate has seen more plans than there are approaches.
+    """
+    if len(surrogate.samples) <= len(surrogate.order) or len(population.plans) < 2:
+        return
+    offspring = population.plans[1:]
+    pool = np.vstack([offspring, population.mutate(np.repeat(offspring, factor, axis=0), rate=rate)])
+    # Drop plans that round to the same green times, keeping the continuous values
+    _, first = np.unique(np.rint(pool), axis=0, return_index=True)
+    pool = pool[np.sort(first)]
+    chosen = pool[surrogate.screen(pool, len(offspring))]
+    if len(chosen) < len(offspring):
+        chosen = np.vstack([chosen, offspring[len(chosen):]])
+    population.plans = np.vstack([population.plans[:1], chosen])
@@ -1,4 +1,7 @@
-import traci
+from sumo_backend import get_backend
+
+# libsumo when installed, socket TraCI otherwise
+traci = get_backend()
 
 # Start the SUMO simulation in headless mode (no GUI)
 sumo_cmd = ["sumo", "-c", "osm.sumocfg"]
@@ -0,0 +1,29 @@
+import os
+
+from demand import Manifest
+
+
+def test_manifest_tracks_inputs_and_outputs(tmp_path):
+    source, output = tmp_path / "counts.csv", tmp_path / "flows.rou.xml"
+    source.write_text("day,begin,end\n")
+    output.write_text("<routes/>")
+    path = str(tmp_path / "manifest.json")
+
+    manifest = Manifest(path)
+    digest = Manifest.digest([str(source)], {"period": 900})
+    assert not manifest.current([str(output)], digest)
+    manifest.record([str(output)], digest)
+    manifest.save()
+
+    reloaded = Manifest(path)
+    assert reloaded.current([str(output)], digest)
+    assert Manifest.digest([str(source)], {"period": 600}) != digest
+
+    source.write_text("day,begin,end\n0,0,900\n")
+    assert not reloaded.current([str(output)], Manifest.digest([str(source)], {"period": 900}))
+
+    output.write_text("<routes>edited</routes>")
+    assert not reloaded.current([str(output)], digest)
+
+    os.remove(output)
+    assert not reloaded.current([str(output)], digest)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from online_stats import RunningStats, QuantileSketch, ranks, rank_correlation
+
+
+def average_ranks(values):
+    """Ranks with ties at their average rank, as scipy.stats.rankdata(method='average')"""
+    values = list(values)
+    result = []
+    for value in values:
+        below = sum(v < value for v in values)
+        equal = sum(v == value for v in values)
+        result.append(below + (equal + 1) / 2)
+    return np.array(result)
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(7)
+    return [rng.gamma(2.0, 5.0, size=n) for n in (1, 40, 250, 0, 13)]
+
+
+def test_running_stats_merge_matches_direct(samples):
+    merged = RunningStats()
+    for part in samples:
+        single = RunningStats()
+        for value in part:
+            single.add(value)
+        merged.merge(single)
+    everything = np.concatenate(samples)
+    assert merged.count == len(everything)
+    assert merged.mean == pytest.approx(everything.mean())
+    assert merged.std == pytest.approx(everything.std(ddof=1))
+    assert merged.min == everything.min()
+    assert merged.max == everything.max()
+    assert merged.total == pytest.approx(everything.sum())
+
+
+def test_running_stats_add_many_matches_add(samples):
+    one, many = RunningStats(), RunningStats()
+    for part in samples:
+        for value in part:
+            one.add(value)
+        many.add_many(part)
+    assert many.summary() == pytest.approx(one.summary())
+
+
+def test_running_stats_empty():
+    assert RunningStats().summary() == {"count": 0, "mean": 0, "std": 0, "min": 0, "max": 0}
+    assert RunningStats().add(3.0).std == 0.0
+
+
+def test_quantile_sketch_merge_matches_direct(samples):
+    merged = QuantileSketch()
+    for part in samples:
+        merged.merge(QuantileSketch().add_many(part))
+    everything = np.concatenate(samples)
+    direct = QuantileSketch().add_many(everything)
+    assert np.array_equal(merged.bins, direct.bins)
+    assert merged.summary() == pytest.approx(direct.summary())
+    for q in (50, 90, 95):
+        # Percentiles are exact to the bin they fall in
+        assert abs(merged.percentile(q) - np.percentile(everything, q)) <= merged.bin_width
+
+
+def test_quantile_sketch_overflow_and_mismatch():
+    sketch = QuantileSketch(bin_width=1, limit=10).add_many([5, 50, 500])
+    assert sketch.bins[-1] == 2
+    assert sketch.moments.max == 500
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(bin_width=0.5, limit=10))
+
+
+def test_ranks_average_ties():
+    values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0, 5.0, 3.0, 5.0]
+    assert np.array_equal(ranks(values), average_ranks(values))
+    assert list(ranks([10, 20, 20, 30])) == [1, 2.5, 2.5, 4]
+
+
+def test_rank_correlation_with_ties():
+    a = [1, 2, 2, 3, 4, 4, 4, 7]
+    b = [2, 1, 3, 3, 5, 4, 6, 6]
+    expected = np.corrcoef(average_ranks(a), average_ranks(b))[0, 1]
+    assert rank_correlation(a, b) == pytest.approx(expected)
+    assert rank_correlation(a, a) == pytest.approx(1.0)
+    assert rank_correlation(a, [-x for x in a]) == pytest.approx(-1.0)
+
+
+def test_rank_correlation_undefined():
+    assert np.isnan(rank_correlation([1, 2], [2, 1]))
+    assert np.isnan(rank_correlation([1, 1, 1], [1, 2, 3]))
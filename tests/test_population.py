@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from population import Population, payoff_matrix, replicator_adjustments, replicator_update, stats_arrays
+
+order = ["west", "south", "north", "east"]
+weights = {"delay": 0.5, "throughput": 0.3, "queue": 0.2}
+
+
+def run_stats(delays, truncated=False):
+    stats = {a: {"mean_delay": d, "max_delay": 2 * d, "throughput": 50, "max_queue": 3}
+             for a, d in zip(order, delays)}
+    stats["_run"] = {"truncated": truncated}
+    return stats
+
+
+def test_stats_arrays_masks_failed_and_truncated():
+    results = [run_stats([1, 2, 3, 4]), None, run_stats([1, 1, 1, 1], truncated=True)]
+    arrays, valid = stats_arrays(results, order)
+    assert list(valid) == [True, False, False]
+    assert list(arrays["mean_delay"][0]) == [1, 2, 3, 4]
+    assert not arrays["mean_delay"][1:].any()
+
+
+def test_replicator_adjustments_sum_to_zero():
+    payoffs = np.array([[1.0, 2.0, 3.0, 2.0], [0.0, 0.0, 0.0, 0.0]])
+    adjustments = replicator_adjustments(payoffs, gain=8)
+    assert adjustments.sum(axis=1) == pytest.approx([0, 0])
+    assert adjustments[0, 2] > 0 > adjustments[0, 0]
+    assert not adjustments[1].any()
+
+
+def test_evolve_keeps_best_plan_and_masks_invalid():
+    population = Population(4, dict.fromkeys(order, 30), np.random.default_rng(3))
+    before = population.plans.copy()
+    results = [run_stats([5, 5, 5, 5]), run_stats([1, 2, 1, 2]), run_stats([3, 3, 3, 3]), None]
+    arrays, valid = stats_arrays(results, order)
+    max_metrics = {"delay": 10, "throughput": 100, "queue": 10}
+    payoffs = payoff_matrix(arrays, weights, max_metrics)
+
+    adjustments = population.evolve(arrays, valid, payoffs)
+
+    assert not adjustments[3].any()
+    expected = np.clip(before[1] + adjustments[1], population.min_phases, population.max_phases)
+    assert population.plans[0] == pytest.approx(expected)
+    assert population.plans.shape == before.shape
+    assert ((population.plans >= population.min_phases) & (population.plans <= population.max_phases)).all()
+
+
+def test_evolve_without_valid_runs_only_mutates():
+    population = Population(3, dict.fromkeys(order, 30), np.random.default_rng(5))
+    arrays, valid = stats_arrays([None, None, None], order)
+    adjustments = population.evolve(arrays, valid, np.zeros((3, 4)))
+    assert not adjustments.any()
+    assert ((population.plans >= 10) & (population.plans <= 60)).all()
+
+
+def test_replicator_update_matches_population_step():
+    stats = run_stats([4, 1, 2, 1])
+    max_metrics = {"delay": 1, "throughput": 1, "queue": 1}
+    plan, payoffs, adjustments = replicator_update(stats, dict.fromkeys(order, 30), max_metrics, weights)
+    assert max_metrics == {"delay": 8, "throughput": 50, "queue": 3}
+    arrays, _ = stats_arrays([stats], order)
+    expected = replicator_adjustments(payoff_matrix(arrays, weights, max_metrics), 8)[0]
+    assert adjustments == {a: int(e) for a, e in zip(order, expected)}
+    assert plan == {a: 30 + adjustments[a] for a in order}
+    assert payoffs["west"] > payoffs["south"]
@@ -0,0 +1,39 @@
+import pytest
+
+from sumo_eval import dominated, incumbent_at
+
+
+def summary(delays, queues=(2.0, 2.0), n=100, std=5.0):
+    return {approach: {"delay": [n, delay, std], "queue": [n, queue, 1.0]}
+            for approach, delay, queue in zip(("west", "east"), delays, queues)}
+
+
+def test_clearly_worse_candidate_is_dominated():
+    assert dominated(summary((30.0, 30.0)), summary((10.0, 10.0)), margin=0.1)
+
+
+def test_gap_within_margin_or_noise_is_not_dominated():
+    incumbent = summary((10.0, 10.0))
+    assert not dominated(summary((10.5, 10.5)), incumbent, margin=0.1)
+    # Same gap as above, but on a handful of vehicles with a wide spread
+    assert not dominated(summary((30.0, 30.0), n=3, std=30.0), incumbent, margin=0.1)
+    assert not dominated(summary((30.0, 30.0), n=1), incumbent, margin=0.1)
+
+
+def test_approach_better_on_delay_or_queue_is_not_dominated():
+    incumbent = summary((10.0, 10.0), queues=(5.0, 5.0))
+    assert not dominated(summary((2.0, 60.0), queues=(5.0, 5.0)), incumbent, margin=0.1)
+    assert not dominated(summary((30.0, 30.0), queues=(1.0, 5.0)), incumbent, margin=0.1)
+
+
+def test_no_verdict_without_incumbent_stats():
+    assert not dominated(summary((30.0, 30.0)), None, margin=0.1)
+    assert incumbent_at([[100, 20.0]], 100) is None
+
+
+def test_incumbent_is_interpolated_between_checkpoints():
+    checkpoints = [[100, 20.0, summary((10.0, 10.0), n=100)], [200, 40.0, summary((20.0, 20.0), n=300)]]
+    stats = incumbent_at(checkpoints, 150)
+    assert stats["west"]["delay"] == pytest.approx([200, 15.0, 5.0])
+    assert incumbent_at(checkpoints, 50) is None
+    assert incumbent_at(checkpoints, 250) is None
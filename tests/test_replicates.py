@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from replicates import ReplicateScheduler, half_width, mean_stats, pooled
+
+nan = np.nan
+
+
+@pytest.fixture
+def scheduler():
+    return ReplicateScheduler({"seed": 42}, {"west": ["w"], "east": ["e"]}, replicates=3)
+
+
+def test_clear_winner_needs_no_more_replicates(scheduler):
+    costs = np.array([[1.0, 1.1, 0.9], [5.0, 5.2, 4.9]])
+    assert scheduler.uncertain(costs) == []
+
+
+def test_close_plans_are_uncertain_with_the_best(scheduler):
+    costs = np.array([[1.0, 2.0, 1.5], [1.2, 1.8, 1.6], [9.0, 9.1, 9.2]])
+    assert scheduler.uncertain(costs) == [1, 0]
+
+
+def test_identical_outcomes_are_a_tie(scheduler):
+    costs = np.array([[2.0, 3.0, 2.5], [2.0, 3.0, 2.5]])
+    assert scheduler.uncertain(costs) == []
+
+
+def test_only_paired_seeds_count(scheduler):
+    # Plan 1 failed on all but one seed: a single pair decides nothing yet
+    costs = np.array([[1.0, 1.1, 0.9], [nan, 5.0, nan], [nan, nan, nan]])
+    assert scheduler.uncertain(costs) == [1, 0]
+    assert scheduler.uncertain(np.full((2, 3), nan)) == []
+
+
+def test_half_width():
+    samples = [1.0, 2.0, 3.0]
+    assert half_width(samples) == pytest.approx(4.303 * 1.0 / np.sqrt(3))
+    assert half_width([1.0]) == np.inf
+
+
+def test_pooled_matches_one_pass():
+    parts = [[1.0, 2.0, 4.0], [5.0, 6.0], [7.0]]
+    summaries = [[len(p), np.mean(p), np.std(p, ddof=1) if len(p) > 1 else 0.0] for p in parts]
+    values = sum(parts, [])
+    assert pooled(summaries) == pytest.approx([6, np.mean(values), np.std(values, ddof=1)])
+
+
+def test_mean_stats_averages_replicates_and_checkpoints():
+    def summary(d):
+        return {"west": {"delay": [10, d, 1.0], "queue": [50, 2.0, 1.0]}}
+
+    runs = [{"west": {"mean_delay": d, "throughput": t},
+             "_run": {"steps": 100, "checkpoints": [[50, d, summary(d)], [100, d + 1, summary(d + 1)]]}}
+            for d, t in ((1.0, 10), (3.0, 20))]
+    stats = mean_stats(runs, ["west"])
+    assert stats["west"]["mean_delay"] == 2.0
+    assert stats["west"]["throughput"] == 15.0
+    low, high = stats["west"]["mean_delay_ci"]
+    assert low < 2.0 < high
+    assert stats["_run"]["replicates"] == 2
+    assert stats["_run"]["steps"] == 200
+    checkpoints = stats["_run"]["checkpoints"]
+    assert [c[:2] for c in checkpoints] == [[50, 2.0], [100, 3.0]]
+    count, mean, std = checkpoints[0][2]["west"]["delay"]
+    assert (count, mean) == (20, 2.0)
+    assert std > 1.0
+    assert checkpoints[0][2]["west"]["queue"] == pytest.approx([100, 2.0, 1.0], rel=1e-2)
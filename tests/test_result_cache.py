@@ -0,0 +1,88 @@
+import pytest
+
+from result_cache import ResultCache, config_key, run_key
+
+plan = {"west": 30, "south": 30, "north": 30, "east": 30}
+approaches = {"west": {"edges": ["w"], "exit": "w_out"}, "east": {"edges": ["e"], "exit": "e_out"}}
+sumocfg = """<configuration>
+    <input>
+        <net-file value="osm.net.xml"/>
+        <route-files value="osm.rou.xml"/>
+    </input>
+</configuration>
+"""
+
+
+@pytest.fixture
+def config(tmp_path):
+    files = {}
+    for name in ("osm.net.xml", "osm.rou.xml", "state.xml", "other.rou.xml"):
+        path = tmp_path / name
+        path.write_text(name)
+        files[name] = str(path)
+    (tmp_path / "osm.sumocfg").write_text(sumocfg)
+    return {
+        "sumocfg": str(tmp_path / "osm.sumocfg"),
+        "net_file": files["osm.net.xml"],
+        "simulation_steps": 3600,
+        "seed": 42,
+    }
+
+
+@pytest.mark.parametrize("field, value", [
+    ("seed", 43),
+    ("simulation_steps", 1800),
+    ("begin", 600),
+    ("stepping", "cycle"),
+    ("fidelity", "meso"),
+    ("tls_mode", "netfile"),
+    ("sumocfg_profile", "lean"),
+    ("series_every", 10),
+])
+def test_run_key_changes_with_each_field(config, field, value):
+    assert run_key(plan, dict(config, **{field: value}), approaches=approaches) \
+        != run_key(plan, config, approaches=approaches)
+
+
+def test_run_key_changes_with_files(config, tmp_path):
+    base = run_key(plan, config, approaches=approaches)
+    other_routes = dict(config, route_files=[str(tmp_path / "other.rou.xml")])
+    assert run_key(plan, other_routes, approaches=approaches) != base
+    with_state = dict(config, state_file=str(tmp_path / "state.xml"))
+    assert run_key(plan, with_state, approaches=approaches) != base
+    (tmp_path / "osm.rou.xml").write_text("changed demand")
+    changed_demand = run_key(plan, config, approaches=approaches)
+    assert changed_demand != base
+    (tmp_path / "osm.net.xml").write_text("changed network")
+    assert run_key(plan, config, approaches=approaches) != changed_demand
+
+
+def test_run_key_changes_with_plan_and_approaches(config):
+    base = run_key(plan, config, approaches=approaches)
+    assert run_key(dict(plan, west=31), config, approaches=approaches) != base
+    assert run_key(plan, config, approaches={"west": approaches["west"]}) != base
+    assert run_key(plan, config, config_key(config, approaches)) == base
+
+
+def test_cache_round_trip_and_entries(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    stats = {"west": {"mean_delay": 1.5}, "_run": {"truncated": False}}
+    assert cache.get("a") is None
+    cache.put("a", plan, stats, "config1")
+    cache.put("b", dict(plan, west=40), stats, "config2")
+    assert cache.get("a") == stats
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [p for p, _ in cache.entries("config2")] == [dict(plan, west=40)]
+    assert len(list(cache.entries())) == 2
+    cache.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, plan, {"key": key})
+    cache.get("a")
+    cache.put("c", plan, {"key": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"key": "a"}
+    cache.close()
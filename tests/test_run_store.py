@@ -0,0 +1,74 @@
+import pytest
+
+from run_store import RunStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"), batch_size=2)
+    yield store
+    store.close()
+
+
+def test_generations_round_trip(store):
+    run_id = store.start_run("egt_so4", {"mode": "generations"})
+    other = store.start_run("batch")
+    for generation in (1, 2):
+        for approach in ("west", "east"):
+            store.log(run_id, generation, approach, {"mean_delay": generation, "green_time": 30,
+                                                     "cache_hits": 3, "mean_delay_ci": [0.5, 1.5]})
+    store.log(other, 1, "west", {"mean_delay": 7})
+
+    rows = store.generations([run_id], approach="west")
+    assert [(r["generation"], r["mean_delay"]) for r in rows] == [(1, 1.0), (2, 2.0)]
+    assert rows[0]["cache_hits"] == 3
+    assert rows[0]["mean_delay_ci"] == [0.5, 1.5]
+    assert rows[0]["max_queue"] is None
+    assert len(store.generations(script="batch")) == 1
+    assert [r[0] for r in store.runs("egt_so4")] == [run_id]
+    assert store.runs("egt_so4")[0][3] == {"mode": "generations"}
+
+
+def test_profiles_steps_and_candidates(store):
+    run_id = store.start_run("egt_so4")
+    store.log_profile(run_id, 1, {"evaluate": [2.0, 1], "sim.step": [5.0, 600]})
+    store.log_step(run_id, 1, 10, "west", 3, 2, 1.5)
+    store.log_step(run_id, 2, 10, "west", 4, 3, 2.5)
+    store.log_candidate(run_id, 1, 0, "meso", 4.0, {"west": 30})
+    store.log_candidate(run_id, 1, 0, "micro", 5.0, {"west": 30})
+    store.log_candidate(run_id, 2, 1, "meso", 6.0, {"west": 33})
+
+    assert store.profiles(run_id) == {1: {"evaluate": [2.0, 1], "sim.step": [5.0, 600]}}
+    assert store.steps(run_id, 1) == [{"generation": 1, "step": 10, "approach": "west",
+                                       "queue": 3, "halting": 2, "mean_time_loss": 1.5}]
+    assert len(store.steps(run_id, approach="west")) == 2
+    assert store.candidates(run_id) == {(1, 0): {"meso": 4.0, "micro": 5.0}, (2, 1): {"meso": 6.0}}
+    assert store.candidates(run_id, 2) == {(2, 1): {"meso": 6.0}}
+
+
+def test_discard_after_drops_later_generations_of_one_run(store):
+    run_id = store.start_run("egt_so4")
+    other = store.start_run("egt_so4")
+    for generation in (1, 2, 3):
+        store.log(run_id, generation, "west", {"mean_delay": generation})
+        store.log_step(run_id, generation, 10, "west", 3, 2, 1.5)
+        store.log_profile(run_id, generation, {"evaluate": [2.0, 1]})
+        store.log_candidate(run_id, generation, 0, "meso", 4.0, {"west": 30})
+    store.log(other, 3, "west", {"mean_delay": 7})
+
+    store.discard_after(run_id, 1)
+
+    assert [r["generation"] for r in store.generations([run_id])] == [1]
+    assert [r["generation"] for r in store.steps(run_id)] == [1]
+    assert list(store.profiles(run_id)) == [1]
+    assert list(store.candidates(run_id)) == [(1, 0)]
+    assert len(store.generations([other])) == 1
+
+
+def test_import_csv(store, tmp_path):
+    path = tmp_path / "optimization_log.csv"
+    path.write_text("Generation,Approach,GreenTime,MeanDelay,Note\n1,west,30,2.5,x\n1,east,30,,\n")
+    run_id = store.import_csv(str(path))
+    rows = store.generations([run_id])
+    assert rows[0]["green_time"] == 30 and rows[0]["mean_delay"] == 2.5 and rows[0]["Note"] == "x"
+    assert rows[1]["mean_delay"] is None
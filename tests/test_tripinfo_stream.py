@@ -0,0 +1,77 @@
+import gzip
+import threading
+import time
+
+import pytest
+
+from tripinfo_stream import aggregate_tripinfo, iter_tripinfo
+
+tripinfo = """<?xml version="1.0" encoding="UTF-8"?>
+<tripinfos>
+    <tripinfo id="a" departLane="15491645#0_0" timeLoss="10.0"/>
+    <tripinfo id="b" departLane="15491645#0_1" timeLoss="20.0"/>
+    <tripinfo id="c" departLane="edge_with_underscore_0" timeLoss="4.0"/>
+    <tripinfo id="d" departLane="elsewhere_0" timeLoss="99.0"/>
+</tripinfos>
+"""
+approaches = {"west": {"edges": ["15491645#0"]}, "east": ["edge_with_underscore"], "north": ["141821921#1"]}
+
+
+@pytest.fixture(params=["tripinfo.xml", "tripinfo.xml.gz"])
+def path(request, tmp_path):
+    path = tmp_path / request.param
+    opener = gzip.open if request.param.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write(tripinfo)
+    return str(path)
+
+
+def test_iter_tripinfo(path):
+    assert [trip["id"] for trip in iter_tripinfo(path)] == ["a", "b", "c", "d"]
+
+
+def test_aggregate_tripinfo(path):
+    stats = aggregate_tripinfo(path, approaches)
+    assert stats["west"]["count"] == 2
+    assert stats["west"]["mean"] == pytest.approx(15.0)
+    assert stats["west"]["max"] == 20.0
+    assert stats["east"]["count"] == 1
+    assert stats["east"]["mean"] == pytest.approx(4.0)
+    assert stats["north"]["count"] == 0
+
+
+def open_for_append(path):
+    return gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", ["tripinfo.xml", "tripinfo.xml.gz"])
+def test_aggregate_tripinfo_follows_growing_file(name, tmp_path):
+    path = str(tmp_path / name)
+    head, tail = tripinfo.split('    <tripinfo id="c"')
+    f = open_for_append(path)
+    f.write(head)
+    f.flush()
+
+    def append():
+        time.sleep(0.3)
+        f.write('    <tripinfo id="c"' + tail)
+        f.close()
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    stats = aggregate_tripinfo(path, approaches, follow=True, poll_interval=0.05, timeout=5)
+    writer.join()
+    assert stats["west"]["count"] == 2
+    assert stats["east"]["count"] == 1
+
+
+@pytest.mark.parametrize("name", ["tripinfo.xml", "tripinfo.xml.gz"])
+def test_aggregate_tripinfo_follow_gives_up_after_timeout(name, tmp_path):
+    path = str(tmp_path / name)
+    f = open_for_append(path)
+    f.write(tripinfo.split('    <tripinfo id="c"')[0])
+    f.flush()
+    stats = aggregate_tripinfo(path, approaches, follow=True, poll_interval=0.05, timeout=0.2)
+    f.close()
+    assert stats["west"]["count"] == 2
+    assert stats["east"]["count"] == 0
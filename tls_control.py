@@ -0,0 +1,106 @@
+# Index of each approach's green phase in tlLogic J0
+green_phases = {
+    "west": 0,
+    "south": 2,
+    "north": 4,
+    "east": 6
+}
+
+
+def set_green_splits(conn, strategies, tls_id="J0", phases=green_phases):
+    """Install strategies as the green durations of the running programme of tls_id
+
+    The network file is left untouched; SUMO keeps the new logic until the
+    simulation ends or it is replaced again.
+    """
+    program = conn.trafficlight.getProgram(tls_id)
+    logic = next(
+        (l for l in conn.trafficlight.getAllProgramLogics(tls_id) if l.programID == program),
+        None
+    )
+    if logic is None:
+        raise ValueError(f"No program {program} for traffic light {tls_id}")
+
+    for approach, index in phases.items():
+        phase = logic.phases[index]
+        # J0 is 'actuated' in the network, so pin minDur/maxDur to the split as well
+        phase.duration = phase.minDur = phase.maxDur = strategies[approach]
+
+    current = conn.trafficlight.getPhase(tls_id)
+    logic.currentPhaseIndex = current
+    conn.trafficlight.setProgramLogic(tls_id, logic)
+    return logic
+
+
+def start_cycle(conn, strategies, tls_id="J0", phases=green_phases):
+    """Apply a new split at a cycle boundary, including the green phase just begun
+
+    Boundaries are usually seen a step after the phase started, so the time
+    already spent in it is taken off its new duration.
+    """
+    set_green_splits(conn, strategies, tls_id, phases)
+    current = conn.trafficlight.getPhase(tls_id)
+    for approach, index in phases.items():
+        if index == current:
+            spent = conn.trafficlight.getSpentDuration(tls_id)
+            conn.trafficlight.setPhaseDuration(tls_id, max(strategies[approach] - spent, 0))
+
+
+class CycleWatcher:
+    """Detects the step on which tls_id re-enters its first phase"""
+
+    def __init__(self, tls_id="J0", first_phase=0):
+        self.tls_id = tls_id
+        self.first_phase = first_phase
+        self.last_phase = None
+
+    def boundary(self, conn):
+        phase = conn.trafficlight.getPhase(self.tls_id)
+        crossed = (
+            self.last_phase is not None
+            and phase == self.first_phase
+            and self.last_phase != self.first_phase
+        )
+        self.last_phase = phase
+        return crossed
+
+
+class CycleClock:
+    """Cycle boundaries of tls_id worked out from its phase durations instead of watched every step
+
+    phases are the tlLogic phases of the network index; green phases take
+    their duration from the strategies in force, which start_cycle() pins.
+    """
+
+    def __init__(self, phases, tls_id="J0", green=green_phases, first_phase=0):
+        self.durations = [float(phase["duration"]) for phase in phases]
+        self.tls_id = tls_id
+        self.green = green
+        self.first_phase = first_phase
+
+    def _durations(self, strategies):
+        durations = list(self.durations)
+        for approach, index in self.green.items():
+            durations[index] = strategies[approach]
+        return durations
+
+    def cycle_length(self, strategies):
+        return sum(self._durations(strategies))
+
+    def green_starts(self, time, strategies):
+        """Time at which each approach's green begins in the cycle starting at time"""
+        durations = self._durations(strategies)
+        n = len(durations)
+        return {approach: time + sum(durations[(self.first_phase + k) % n]
+                                     for k in range((index - self.first_phase) % n))
+                for approach, index in self.green.items()}
+
+    def next_boundary(self, conn, strategies):
+        """Time at which tls_id next re-enters its first phase"""
+        durations = self._durations(strategies)
+        index = (conn.trafficlight.getPhase(self.tls_id) + 1) % len(durations)
+        time = conn.trafficlight.getNextSwitch(self.tls_id)
+        while index != self.first_phase:
+            time += durations[index]
+            index = (index + 1) % len(durations)
+        return time
@@ -0,0 +1,62 @@
+import traci.constants as tc
+
+from online_stats import QuantileSketch
+from tripinfo_stream import edge_index
+
+
+class TripAccounting:
+    """Throughput and trip delay per departure approach, kept up to date during the run
+
+    Replaces reading tripinfo.xml after the run: departures and arrivals come
+    from one simulation subscription, each vehicle's departure approach is
+    cached when it enters the network, and vehicles that departed on an
+    approach are subscribed for their time loss so the value at arrival is
+    already known. Vehicles already running when the accounting starts (after
+    loadState) are adopted by the first edge of their route, so they are
+    counted when they arrive.
+    """
+
+    def __init__(self, conn, approaches):
+        self.conn = conn
+        self.edges = edge_index(approaches)
+        self.vehicle_approach = {}
+        self.time_loss = {}
+        self.sketches = {approach: QuantileSketch() for approach in approaches}
+        conn.simulation.subscribe([tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS])
+        for veh_id in conn.vehicle.getIDList():
+            self._track(veh_id, conn.vehicle.getRoute(veh_id)[0])
+
+    def step(self):
+        """Account for the vehicles that departed or arrived in the last step"""
+        events = self.conn.simulation.getSubscriptionResults()
+
+        for veh_id, values in self.conn.vehicle.getAllSubscriptionResults().items():
+            if tc.VAR_TIMELOSS in values:
+                self.time_loss[veh_id] = values[tc.VAR_TIMELOSS]
+
+        for veh_id in events.get(tc.VAR_ARRIVED_VEHICLES_IDS, ()):
+            approach = self.vehicle_approach.pop(veh_id, None)
+            time_loss = self.time_loss.pop(veh_id, 0.0)
+            if approach is not None:
+                self.sketches[approach].add(time_loss)
+
+        for veh_id in events.get(tc.VAR_DEPARTED_VEHICLES_IDS, ()):
+            self._track(veh_id, self.conn.vehicle.getRoadID(veh_id))
+
+    def _track(self, veh_id, edge):
+        approach = self.edges.get(edge)
+        if approach is not None:
+            self.vehicle_approach[veh_id] = approach
+            self.conn.vehicle.subscribe(veh_id, [tc.VAR_TIMELOSS])
+
+    def stats(self):
+        """throughput (arrived vehicles) and trip time loss per departure approach"""
+        stats = {}
+        for approach, sketch in self.sketches.items():
+            summary = sketch.summary()
+            stats[approach] = {
+                "throughput": summary["count"],
+                "mean_trip_delay": summary["mean"],
+                "max_trip_delay": summary["max"]
+            }
+        return stats
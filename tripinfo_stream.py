@@ -0,0 +1,80 @@
+import time
+import zlib
+from xml.etree import ElementTree as ET
+
+from online_stats import QuantileSketch
+
+chunk_size = 1 << 16
+
+
+def edge_index(approaches):
+    """edge -> approach for either approach layout used by the scripts"""
+    index = {}
+    for approach, data in approaches.items():
+        edges = data["edges"] if isinstance(data, dict) else data
+        for edge in edges:
+            index[edge] = approach
+    return index
+
+
+def _read_chunks(path, follow, poll_interval, timeout):
+    """Yield decompressed byte chunks of path, optionally waiting for SUMO to append more"""
+    # wbits 32+15 accepts the gzip header; a decompressobj copes with a truncated stream
+    decompressor = zlib.decompressobj(32 + 15) if path.endswith(".gz") else None
+    with open(path, "rb") as f:
+        idle_since = time.monotonic()
+        while True:
+            data = f.read(chunk_size)
+            if data:
+                idle_since = time.monotonic()
+                yield decompressor.decompress(data) if decompressor else data
+                continue
+            if not follow:
+                return
+            if timeout is not None and time.monotonic() - idle_since > timeout:
+                return
+            time.sleep(poll_interval)
+
+
+def iter_tripinfo(path, follow=False, poll_interval=0.5, timeout=None):
+    """Yield the attributes of every <tripinfo> in path with constant memory
+
+    The file is parsed incrementally (XMLPullParser, the push form of
+    iterparse) and each element is cleared once read. Gzipped files are
+    recognised by their .gz suffix. With follow=True the reader keeps waiting
+    for SUMO to append until the closing </tripinfos> arrives, or until no new
+    data has shown up for timeout seconds.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in _read_chunks(path, follow, poll_interval, timeout):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem is root:
+                return
+            if elem.tag == "tripinfo":
+                yield dict(elem.attrib)
+                # Drop finished trips so the tree never grows
+                root.clear()
+
+
+def aggregate_tripinfo(path, approaches, percentiles=(50, 90, 95), follow=False,
+                       poll_interval=0.5, timeout=None):
+    """Per-approach timeLoss statistics in one streaming pass over a tripinfo file
+
+    Trips are assigned to an approach by the edge of their departLane.
+    """
+    edges = edge_index(approaches)
+    sketches = {approach: QuantileSketch() for approach in approaches}
+
+    for trip in iter_tripinfo(path, follow, poll_interval, timeout):
+        start_edge = trip.get("departLane", "").rsplit("_", 1)[0]
+        approach = edges.get(start_edge)
+        if approach is not None:
+            sketches[approach].add(float(trip.get("timeLoss", 0)))
+
+    return {approach: sketch.summary(percentiles) for approach, sketch in sketches.items()}